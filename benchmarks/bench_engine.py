@@ -0,0 +1,51 @@
+## @file bench_engine.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-05
+#  @brief Compare the expression engine against the old raw eval path
+#
+#  Run with: python3 ./benchmarks/bench_engine.py
+
+from timing import best_of
+
+from equation_eval import default_assignments, eval_equation, normalise_equation
+
+EQUATIONS = ["1+1", "3+3**2+4", "sin(pi/4)^2 + cos(pi/4)^2", "(5^^3) * 2 - exp(1)"]
+
+def raw_eval(equation_str: str, assignments: dict):
+    """ The evaluation path before the expression engine """
+    return eval(normalise_equation(equation_str), assignments)
+
+def measure(number: int = 20000) -> dict:
+    """
+    Measure the time of eval_equation and raw eval for each equation
+
+    ### Params:
+    number = 20000
+     The number of evaluations in each repeat
+
+    ### Returns:
+    results : dict
+     The seconds per evaluation keyed by benchmark name
+    """
+    assignments = dict()
+    default_assignments(assignments)
+    results = dict()
+
+    for equation in EQUATIONS:
+        results["engine/raw_eval/" + equation] = best_of(lambda: raw_eval(equation, assignments), number)
+        results["engine/eval_equation/" + equation] = best_of(lambda: eval_equation(equation, assignments), number)
+
+    return results
+
+def main(number: int = 20000):
+    results = measure(number)
+
+    print(f"{'equation':<30}{'raw eval (us)':>16}{'engine (us)':>16}")
+    for equation in EQUATIONS:
+        raw = results["engine/raw_eval/" + equation]
+        engine = results["engine/eval_equation/" + equation]
+
+        print(f"{equation:<30}{raw * 1e6:>16.2f}{engine * 1e6:>16.2f}")
+
+if __name__ == "__main__":
+    main()
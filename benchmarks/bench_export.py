@@ -0,0 +1,68 @@
+## @file bench_export.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Measure exporting large histories to text and markdown
+#  @details Each export is of a new worksheet so the typeset maths the
+#  equations keep between exports is worked out every time. No display
+#  is needed.
+#
+#  Run with: python3 ./benchmarks/bench_export.py
+
+import os
+import tempfile
+import types
+
+from timing import best_once
+
+from export import export_txt, export_md
+from worksheet import Worksheet
+
+EXPORT_SIZES = [10000, 100000]
+
+## The equations repeated to fill the history
+LINES = ["# Section", "x_1:=3.5", "f(t):=x_1*t^2+1", "f(2)/3", "sin(f(x_1))+exp(-x_1)", "2**0.5*pi"]
+
+def make_history(size: int):
+    """ Create a stand in for the history holding size equations """
+    worksheet = Worksheet()
+    worksheet.extend(LINES[i % len(LINES)] for i in range(size))
+
+    return types.SimpleNamespace(equations=worksheet)
+
+def measure(repeat: int = 3, sizes: list = EXPORT_SIZES) -> dict:
+    """
+    Measure the time of exporting each size of history
+
+    ### Params:
+    repeat = 3
+     The number of exports of each size, the best is kept
+    sizes = EXPORT_SIZES
+     The numbers of equations to export
+
+    ### Returns:
+    results : dict
+     The seconds per equation keyed by benchmark name
+    """
+    results = dict()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "export")
+
+        for size in sizes:
+            for name, export_function in [("txt", export_txt), ("md", export_md)]:
+                seconds = best_once(lambda: make_history(size),
+                                    lambda history: export_function(history, filename, "Title", "Comment"),
+                                    repeat=repeat)
+                results[f"export/{name}/{size}"] = seconds / size
+
+    return results
+
+def main(repeat: int = 3):
+    results = measure(repeat)
+
+    print(f"{'equations':>10}{'txt (us/eq)':>14}{'md (us/eq)':>14}")
+    for size in EXPORT_SIZES:
+        print(f"{size:>10}{results[f'export/txt/{size}'] * 1e6:>14.2f}{results[f'export/md/{size}'] * 1e6:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+## @file bench_function_scope.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-06
+#  @brief Measure the cost of calling a user function as the session grows
+#
+#  Run with: python3 ./benchmarks/bench_function_scope.py
+
+import itertools
+
+from timing import best_of
+
+from equation_eval import default_assignments, create_assignment, Namespace
+
+SESSION_SIZES = [10, 100, 1000, 5000]
+
+def make_session(size: int) -> dict:
+    """ Create a namespace with size variables and f(x) and g(x) defined, g is memoised """
+    assignments = Namespace()
+    default_assignments(assignments)
+
+    for i in range(size):
+        name, value = create_assignment(f"v{i}:={i}", assignments)
+        assignments[name] = value
+
+    for definition in ["f(x):=2*x+1", "g(x):=f(x)^2"]:
+        name, value = create_assignment(definition, assignments)
+        assignments[name] = value
+
+    return assignments
+
+def measure(number: int = 20000) -> dict:
+    """
+    Measure the time of calling f(x) and g(f(x)) at each session size
+
+    ### Params:
+    number = 20000
+     The number of calls in each repeat
+
+    ### Returns:
+    results : dict
+     The seconds per call keyed by benchmark name
+    """
+    results = dict()
+
+    for size in SESSION_SIZES:
+        assignments = make_session(size)
+        f = assignments["f"]
+        g = assignments["g"]
+
+        # A new argument every call so g's memo cache never answers
+        arguments = itertools.count()
+
+        results[f"function_scope/f(x)/{size}"] = best_of(lambda: f(3), number)
+        results[f"function_scope/g(f(x))/{size}"] = best_of(lambda: g(f(next(arguments))), number)
+
+    return results
+
+def main(number: int = 20000):
+    results = measure(number)
+
+    print(f"{'assignments':>12}{'f(x) (us)':>12}{'g(f(x)) (us)':>15}")
+    for size in SESSION_SIZES:
+        single = results[f"function_scope/f(x)/{size}"]
+        nested = results[f"function_scope/g(f(x))/{size}"]
+
+        print(f"{size:>12}{single * 1e6:>12.2f}{nested * 1e6:>15.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+## @file bench_history.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Measure adding, deleting and clearing rows of the history
+#  @details The history is drawn in a withdrawn Tk root so a display is
+#  needed but no window is shown. Each size is filled once and then a
+#  single row is added and deleted so the times show how the cost of
+#  one change grows with the history.
+#
+#  Run with: python3 ./benchmarks/bench_history.py
+
+import os
+import time
+import tkinter as tk
+
+from timing import best_of, best_once, SRC_DIR
+
+from configuration import Config
+from history import History
+from theme import Theme
+from worksheet import Worksheet
+
+HISTORY_SIZES = [1000, 10000, 100000]
+
+def make_history(root: tk.Tk, theme: Theme, size: int) -> History:
+    """ Create a history showing size equations """
+    history = History(root, theme, worksheet=Worksheet())
+    history.grid(row=0, column=0, sticky="nsew")
+
+    history.extend([f"{i}+1" for i in range(size)])
+    root.update_idletasks()
+
+    return history
+
+def measure(number: int = 100, sizes: list = HISTORY_SIZES) -> dict:
+    """
+    Measure filling the history and adding, deleting and clearing rows at
+    each size
+
+    ### Params:
+    number = 100
+     The number of single row changes in each repeat
+    sizes = HISTORY_SIZES
+     The numbers of rows to measure at
+
+    ### Returns:
+    results : dict
+     The seconds per operation keyed by benchmark name, extend is per row
+    """
+    root = tk.Tk()
+    root.withdraw()
+    theme = Theme(Config.load_frozen_json(os.path.join(SRC_DIR, "theme.json")), root)
+    results = dict()
+
+    def append(history: History):
+        history.add("1+1")
+        root.update_idletasks()
+
+    def delete(history: History):
+        history.remove_equation(history.equations[len(history.equations) // 2])
+        root.update_idletasks()
+
+    def clear(history: History):
+        history.clear()
+        root.update_idletasks()
+
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            history = make_history(root, theme, size)
+            results[f"history/extend/{size}"] = (time.perf_counter() - start) / size
+
+            # The deletes remove as many rows as the appends added
+            results[f"history/append/{size}"] = best_of(lambda: append(history), number)
+            results[f"history/delete/{size}"] = best_of(lambda: delete(history), number)
+            history.destroy()
+
+            results[f"history/clear/{size}"] = best_once(lambda: make_history(root, theme, size), clear,
+                                                         lambda history: history.destroy(), repeat=3)
+
+    finally:
+        root.destroy()
+
+    return results
+
+def main(number: int = 100):
+    results = measure(number)
+
+    print(f"{'rows':>8}{'extend (us/row)':>18}{'append (us)':>14}{'delete (us)':>14}{'clear (ms)':>12}")
+    for size in HISTORY_SIZES:
+        print(f"{size:>8}{results[f'history/extend/{size}'] * 1e6:>18.2f}"
+              f"{results[f'history/append/{size}'] * 1e6:>14.2f}{results[f'history/delete/{size}'] * 1e6:>14.2f}"
+              f"{results[f'history/clear/{size}'] * 1e3:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+## @file bench_startup.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Measure the cold start of the application
+#  @details Each start is a new interpreter so nothing is cached between
+#  runs except by the operating system. The time to import main.py is
+#  measured without a display, opening the window needs one.
+#
+#  Run with: python3 ./benchmarks/bench_startup.py
+
+import json
+import subprocess
+import sys
+import time
+
+from timing import SRC_DIR
+
+## Run in the new interpreter, prints the import and window times as JSON
+START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+import main
+imported = time.perf_counter()
+window = None
+try:
+    main.get_cwd = lambda: {src!r}
+    app = main.App()
+    app.update()
+    window = time.perf_counter() - start
+    app.destroy()
+except Exception: # No display
+    pass
+print(json.dumps({{"import": imported - start, "window": window}}))
+"""
+
+def run_process(script: str) -> tuple:
+    """
+    Run a script in a new interpreter
+
+    ### Params:
+    script : str
+     The python source to run
+
+    ### Returns:
+    (total, output)
+     The seconds until the interpreter exited and what it printed
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+
+    return (time.perf_counter() - start, output)
+
+def measure(repeat: int = 5) -> dict:
+    """
+    Measure the cold start
+
+    ### Params:
+    repeat = 5
+     The number of starts, the best is kept
+
+    ### Returns:
+    results : dict
+     The seconds for each stage keyed by benchmark name, the window is
+     left out without a display
+    """
+    results = {"startup/interpreter": min(run_process("pass")[0] for _ in range(repeat))}
+
+    runs = [run_process(START_SCRIPT.format(src=SRC_DIR)) for _ in range(repeat)]
+    times = [json.loads(output.splitlines()[-1]) for _, output in runs]
+
+    results["startup/process"] = min(total for total, _ in runs)
+    results["startup/import"] = min(run["import"] for run in times)
+
+    windows = [run["window"] for run in times if run["window"] is not None]
+    if (len(windows) != 0):
+        results["startup/window"] = min(windows)
+
+    return results
+
+def main(repeat: int = 5):
+    for name, seconds in measure(repeat).items():
+        print(f"{name:<24}{seconds * 1e3:>10.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+## @file run_all.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Run every benchmark, save the results as JSON and compare runs
+#
+#  Run and save the results:
+#  python3 ./benchmarks/run_all.py run -o results.json
+#  Run and compare against an earlier run, exits with 1 on a regression:
+#  python3 ./benchmarks/run_all.py run -o new.json --compare results.json
+#  Compare two saved runs:
+#  python3 ./benchmarks/run_all.py compare results.json new.json
+#
+#  Every result is in seconds per operation so lower is better. The
+#  history suite is recorded as skipped when there is no display, any
+#  other suite that fails is recorded as failed and the run exits with 1.
+#  A comparison counts results missing from the later run as failures.
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import tkinter as tk
+
+import bench_engine
+import bench_export
+import bench_function_scope
+import bench_history
+import bench_startup
+
+## The version of the results file layout
+RESULTS_VERSION = 1
+
+## A result this much slower than the baseline is a regression
+DEFAULT_THRESHOLD = 0.10
+
+## Each suite's measure function, the settings used for a quick run and the errors that mean it can't run here
+SUITES = {
+    "engine": (bench_engine.measure, {"number": 2000}, ()),
+    "function_scope": (bench_function_scope.measure, {"number": 2000}, ()),
+    "history": (bench_history.measure, {"number": 20, "sizes": [1000, 10000]}, (tk.TclError,)),
+    "export": (bench_export.measure, {"repeat": 1, "sizes": [10000]}, ()),
+    "startup": (bench_startup.measure, {"repeat": 2}, ()),
+}
+
+def run_suites(names: list, quick: bool = False) -> dict:
+    """
+    Run benchmark suites
+
+    ### Params:
+    names : list
+     The names of the suites to run from SUITES
+    quick = False
+     Use fewer repeats and smaller sizes
+
+    ### Returns:
+    run : dict
+     The results file contents
+    """
+    run = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": dict(),
+        "skipped": dict(),
+        "failed": dict(),
+    }
+
+    for name in names:
+        measure, quick_settings, unavailable = SUITES[name]
+        print(f"running {name}...", file=sys.stderr)
+
+        try:
+            run["results"].update(measure(**(quick_settings if quick else {})))
+        except unavailable as error: # Such as no display for the history
+            run["skipped"][name] = f"{type(error).__name__}: {error}"
+            print(f"skipped {name}: {run['skipped'][name]}", file=sys.stderr)
+        except Exception as error:
+            run["failed"][name] = f"{type(error).__name__}: {error}"
+            print(f"FAILED {name}: {run['failed'][name]}", file=sys.stderr)
+
+    return run
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> int:
+    """
+    Print how each result has changed from the baseline
+
+    ### Params:
+    baseline : dict
+     The earlier results file contents
+    current : dict
+     The new results file contents
+    threshold = DEFAULT_THRESHOLD
+     The fraction slower a result can be before it is a regression
+
+    ### Returns:
+    regressions : int
+     The number of results slower than the threshold allows or missing
+     from the current run
+    """
+    old = baseline["results"]
+    new = current["results"]
+    regressions = 0
+
+    if (baseline.get("quick") != current.get("quick") or baseline.get("python") != current.get("python")):
+        print("warning: the runs used different settings or python versions")
+
+    print(f"{'benchmark':<44}{'baseline (us)':>15}{'current (us)':>15}{'change':>10}")
+    for name in sorted(old.keys() | new.keys()):
+        if (name not in new): # Skipped, failed or removed, it can't be checked
+            print(f"{name:<44}{old[name] * 1e6:>15.2f}{'':>15}{'missing':>10}  MISSING")
+            regressions += 1
+            continue
+        elif (name not in old):
+            print(f"{name:<44}{'':>15}{new[name] * 1e6:>15.2f}{'added':>10}")
+            continue
+
+        change = new[name] / old[name] - 1
+        flag = ""
+        if (change > threshold):
+            flag = "  REGRESSION"
+            regressions += 1
+        elif (change < -threshold):
+            flag = "  improved"
+
+        print(f"{name:<44}{old[name] * 1e6:>15.2f}{new[name] * 1e6:>15.2f}{change:>+10.1%}{flag}")
+
+    for name, reason in current.get("failed", dict()).items():
+        print(f"suite {name} failed: {reason}")
+
+    print(f"{regressions} regression(s) over {threshold:.0%} or missing result(s)")
+
+    return regressions
+
+def load_results(path: str) -> dict:
+    """
+    Read a results file
+
+    ### Params:
+    path : str
+     The file written by a run
+
+    ### Returns:
+    run : dict
+     The results file contents
+    """
+    with open(path, "r") as f:
+        run = json.load(f)
+
+    if (run.get("version") != RESULTS_VERSION):
+        raise ValueError(f"{path} is not a version {RESULTS_VERSION} results file")
+
+    return run
+
+def main(argv: list = None) -> int:
+    """
+    The command line entry point
+
+    ### Params:
+    argv = None
+     The command line arguments, sys.argv is used if None
+
+    ### Returns:
+    status : int
+     1 if a suite failed or a comparison found a regression, 0 otherwise
+    """
+    parser = argparse.ArgumentParser(description="Run the printing calc benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("-o", "--output", default=None, help="the JSON file to save the results to")
+    run_parser.add_argument("--only", nargs="+", choices=list(SUITES), default=list(SUITES),
+                            help="the suites to run (default all)")
+    run_parser.add_argument("--quick", action="store_true", help="use fewer repeats and smaller sizes")
+    run_parser.add_argument("--compare", default=None, metavar="BASELINE",
+                            help="a results file to compare this run against")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="the fraction slower that counts as a regression (default 0.1)")
+
+    compare_parser = commands.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("baseline", help="the earlier results file")
+    compare_parser.add_argument("current", help="the later results file")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="the fraction slower that counts as a regression (default 0.1)")
+
+    args = parser.parse_args(argv)
+
+    if (args.command == "compare"):
+        current = load_results(args.current)
+        return 1 if compare(load_results(args.baseline), current, args.threshold) or current.get("failed") else 0
+
+    baseline = load_results(args.compare) if args.compare is not None else None
+    run = run_suites(args.only, args.quick)
+
+    if (args.output is not None):
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if (baseline is not None):
+        return 1 if compare(baseline, run, args.threshold) or run["failed"] else 0
+
+    for name, seconds in run["results"].items():
+        print(f"{name:<44}{seconds * 1e6:>15.2f} us")
+
+    return 1 if run["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+## @file timing.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Shared timing helpers for the benchmarks
+#  @details Every benchmark reports the best time of several repeats so
+#  the results are as repeatable as the machine allows.
+
+import os
+import sys
+import time
+import timeit
+
+## The folder holding the application sources
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+if (SRC_DIR not in sys.path):
+    sys.path.insert(0, SRC_DIR)
+
+## The number of times each measurement is repeated, the best is kept
+REPEAT = 5
+
+def best_of(function: callable, number: int, repeat: int = REPEAT) -> float:
+    """
+    Time a function
+
+    ### Params:
+    function : callable
+     The function to time, called with no arguments
+    number : int
+     The number of calls in each repeat
+    repeat = REPEAT
+     The number of repeats
+
+    ### Returns:
+    seconds : float
+     The best time of a single call
+    """
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+def best_once(setup: callable, function: callable, teardown: callable = None, repeat: int = REPEAT) -> float:
+    """
+    Time a function that can only run once per setup, such as clearing
+
+    ### Params:
+    setup : callable
+     Called before each run, its result is passed to function
+    function : callable
+     The function to time
+    teardown = None
+     Called with the result of setup after each run
+    repeat = REPEAT
+     The number of repeats
+
+    ### Returns:
+    seconds : float
+     The best time of a single call
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        value = setup()
+
+        start = time.perf_counter()
+        function(value)
+        best = min(best, time.perf_counter() - start)
+
+        if (teardown is not None):
+            teardown(value)
+
+    return best
@@ -0,0 +1,103 @@
+## @file batch.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-12
+#  @brief Headless evaluation of equation scripts without a display
+#
+#  Run a script with one equation per line:
+#  python3 ./src/batch.py worksheet.txt -o results.md
+#  or from stdin:
+#  cat worksheet.txt | python3 ./src/batch.py --format json
+
+import argparse
+import os
+import sys
+from typing import Iterable, TextIO
+
+from equation import Equation
+from equation_eval import default_assignments, Namespace
+from formats import FORMATS
+
+def run_batch(lines: Iterable[str], out: TextIO, output_format: str = "txt",
+              title: str = "", comment: str = "") -> int:
+    """
+    Evaluate each line as an equation and stream the results to out.
+    Only the current assignments are kept in memory so scripts of any
+    length can be run.
+
+    ### Params:
+    lines
+     The equation strings, one per line
+    out
+     The text stream to write the results to
+    output_format = "txt"
+     The name of the format to use from formats.FORMATS
+    title = ""
+     The title to write at the beginning of the output
+    comment = ""
+     The comment to add after the title
+
+    ### Returns:
+    count : int
+     The number of equations evaluated
+    """
+    assignments = Namespace()
+    default_assignments(assignments)
+
+    formatter = FORMATS[output_format]()
+    count = 0
+
+    out.write(formatter.header(title, comment))
+
+    for line in lines:
+        equation_str = line.strip()
+        if (len(equation_str) == 0):
+            continue
+
+        out.write(formatter.equation(Equation(equation_str, assignments)))
+        count += 1
+
+    out.write(formatter.footer())
+
+    return count
+
+def main(argv: list = None) -> int:
+    """
+    The command line entry point
+
+    ### Params:
+    argv = None
+     The command line arguments, sys.argv is used if None
+
+    ### Returns:
+    status : int
+     The exit status
+    """
+    parser = argparse.ArgumentParser(description="Evaluate a printing calc script without a display.")
+    parser.add_argument("script", nargs="?", default="-", help="the script to run, - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-", help="the file to write to, - for stdout (default)")
+    parser.add_argument("-f", "--format", choices=list(FORMATS), default=None,
+                        help="the output format, worked out from the output file type if not given")
+    parser.add_argument("--title", default="", help="the title to write at the beginning of the output")
+    parser.add_argument("--comment", default="", help="the comment to add after the title")
+    args = parser.parse_args(argv)
+
+    output_format = args.format
+    if (output_format is None):
+        extension = os.path.splitext(args.output)[1][1:]
+        output_format = extension if extension in FORMATS else "txt"
+
+    script = sys.stdin if args.script == "-" else open(args.script, "r")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", buffering=1 << 16)
+
+    try:
+        run_batch(script, out, output_format, args.title, args.comment)
+    finally:
+        if (script is not sys.stdin):
+            script.close()
+        if (out is not sys.stdout):
+            out.close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
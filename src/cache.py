@@ -0,0 +1,108 @@
+## @file cache.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-02
+#  @brief A small bounded least recently used cache with hit/miss counters
+
+from collections import OrderedDict
+
+class LRUCache():
+    """
+    A bounded least recently used cache. Once the cache is full the
+    least recently used entry is evicted to make room for a new one.
+    """
+    def __init__(self, maxsize: int = 1024):
+        """
+        Create an LRU cache
+
+        ### Params:
+        maxsize : int
+         The maximum number of entries to hold
+
+        ### Variables:
+        hits : int
+         The number of lookups that found an entry
+
+        misses : int
+         The number of lookups that did not find an entry
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        """
+        Look up an entry and mark it as most recently used.
+
+        ### Params:
+        key
+         The key of the entry
+        default = None
+         The value to return if the key is not present
+
+        ### Returns:
+        out
+         The cached value or default
+        """
+        try:
+            value = self.__entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Add an entry evicting the least recently used if full.
+
+        ### Params:
+        key
+         The key of the entry
+        value
+         The value to store
+        """
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+
+        while (len(self.__entries) > self.maxsize):
+            self.__entries.popitem(last=False)
+
+    def resize(self, maxsize: int):
+        """
+        Change the maximum size of the cache evicting entries if needed.
+
+        ### Params:
+        maxsize : int
+         The new maximum number of entries
+        """
+        self.maxsize = maxsize
+
+        while (len(self.__entries) > self.maxsize):
+            self.__entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all entries, the counters are kept.
+        """
+        self.__entries.clear()
+
+    def info(self) -> dict:
+        """
+        Get the statistics of the cache
+
+        ### Returns:
+        out : dict
+         The hits, misses, current size and maximum size
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self.__entries), "maxsize": self.maxsize}
@@ -21,6 +21,46 @@ class ConfigDict(dict):
             json.dump(self, f, indent=4)
             f.close()
 
+class FrozenConfigDict(dict):
+    """dot.notation access to a dictionary that can't be changed"""
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("FrozenConfigDict can't be changed")
+
+    __setattr__ = __setitem__ = __delattr__ = __delitem__ = __ior__ = __readonly
+    clear = pop = popitem = setdefault = update = __readonly
+
+    def __new__(cls, *args, **kwargs):
+        config = super().__new__(cls)
+        dict.__init__(config, *args, **kwargs)
+        return config
+
+    def __init__(self, *args, **kwargs):
+        pass # Filled in by __new__ so calling this again can't change it
+
+    def __reduce__(self):
+        return (FrozenConfigDict, (dict(self),))
+
+    @staticmethod
+    def from_pairs(pairs: list) -> "FrozenConfigDict":
+        """
+        Build from the key value pairs of a json object, lists become tuples
+
+        ### Params:
+        pairs : list
+         The (key, value) pairs in the order they were read
+
+        ### Returns:
+        config : FrozenConfigDict
+         The frozen object
+        """
+        return FrozenConfigDict((key, tuple(value) if type(value) is list else value) for key, value in pairs)
+
 class Config(object):
     @staticmethod
     def __load__(data):
@@ -48,6 +88,23 @@ class Config(object):
         with open(path, "r") as f:
             result = Config.__load__(json.loads(f.read()))
         return result
+
+    @staticmethod
+    def load_frozen_json(path: str) -> FrozenConfigDict:
+        """
+        Read a json file into nested FrozenConfigDicts in a single pass
+        while it is parsed
+
+        ### Params:
+        path : str
+         The json file
+
+        ### Returns:
+        config : FrozenConfigDict
+         The file contents, it can't be changed
+        """
+        with open(path, "r") as f:
+            return json.loads(f.read(), object_pairs_hook=FrozenConfigDict.from_pairs)
     
 def test(config):
     config.version = 2
@@ -1,35 +1,34 @@
 ## 
 # @file equation.py
 # @brief the Equation class for the printingCalc project
-# @details This file contains the Equation class, which is used to store the equation its result and create the equation in the GUI
+# @details This file contains the Equation class, which is used to store the equation and its result.
+# It has no GUI code, see equation_view.py for the GUI object.
 # @author Jack Duignan (JackpDuignan@gmail.com)
 
-import tkinter as tk
-from tkinter import ttk
+import time
 
-from configuration import Config, ConfigDict
-from equation_eval import eval_equation, create_assignment
-
-from utils import rgb_to_tk
+import metrics
+from equation_eval import eval_equation, create_assignment, compile_equation, assignment_names, format_result
 
 class Equation():
     """
-    The equation class which stores the equation its result and contains
-    the functions to display it in the GUI.
+    The equation class which stores the equation and its result.
     """
-    def __init__(self, equation: str, assignments: dict = dict(), theme_config: ConfigDict = None):
+    def __init__(self, equation: str, assignments: dict = dict(), evaluate: bool = True):
         """
         Create an equation class
 
         ### Params:
         equation : str
          The raw equation string
-        theme_config
-         The theme config to use
          
         assignments
          The dictionary of functions and variables available
 
+        evaluate = True
+         Evaluate the equation now, otherwise it is left pending until
+         evaluate() is called
+
         ### Variables:
         equation_str : str
          A string representation of the equation
@@ -37,20 +36,78 @@ class Equation():
         result : float or str
          The result of the equation
 
-        frm_equation : str
-         The outer frame of the equation
-
         type : str
-         The type of equation: "None" (default), "expression", "comment",
-         "variable", "function" this is set on __find_result()
+         The type of equation: "None" (default), "equation", "comment",
+         "assignment" this is set on __find_names()
+
+        reads : frozenset
+         The names the equation reads from the assignments
+
+        writes : frozenset
+         The names the equation assigns (at most one)
+
+        value
+         The variable value or function assigned, None otherwise
+
+        error : Exception
+         The error raised when evaluating, None if successful
+
+        key : int
+         The order key given by the History, later equations have larger keys
+
+        pending : bool
+         True while the equation is waiting to be evaluated
+
+        seconds : float
+         The time the last evaluation took as measured by the worksheet,
+         None if it hasn't been measured
         """
         self.assignments = assignments
         self.equation_str = equation
         self.type = "None"
-        self.result = self.__find_result()
+        self.key = None
+        self.__latex = None
+        self.result = None
+        self.value = None
+        self.error = None
+        self.pending = True
+        self.seconds = None
 
+        self.__find_names()
 
-        self.theme = theme_config
+        if (evaluate):
+            self.evaluate()
+
+    def result_text(self) -> str:
+        """
+        Get the text shown for the result
+
+        ### Returns:
+        text : str
+         The result text, empty if there is no result
+        """
+        if (self.pending):
+            return "=..."
+        elif (self.result is not None):
+            return "="+format_result(self.result)
+        else:
+            return ""
+
+    def latex(self) -> str:
+        """
+        Get the equation typeset as LaTeX maths, this is only worked out
+        again when the equation string changes.
+
+        ### Returns:
+        text : str
+         The LaTeX for the equation
+        """
+        if (self.__latex is None):
+            from latex import equation_to_latex # Only needed by the exports
+
+            self.__latex = equation_to_latex(self.equation_str)
+
+        return self.__latex
 
     def __str__(self):
         """
@@ -60,132 +117,127 @@ class Equation():
         out : str
         The equation in string format
         """
-        return self.equation_str + " = " + str(self.result)
+        return self.equation_str + " = " + format_result(self.result)
     
+    def __find_names(self):
+        """
+        Find the type of the equation and the names it reads and writes
+        from the equation string alone, without evaluating it.
+        """
+        self.reads = frozenset()
+        self.writes = frozenset()
+
+        try:
+            if (self.equation_str[0] == "#"): # comment
+                self.type = "comment"
+
+            elif (self.equation_str[0].isalpha() and self.equation_str.find(":") != -1):
+                self.type = "assignment"
+                name, self.reads = assignment_names(self.equation_str)
+                self.writes = frozenset([name])
+
+            else:
+                self.type = "equation"
+                self.reads = compile_equation(self.equation_str).names
+
+        except Exception: # Invalid equations are reported when evaluated
+            pass
+
     def __find_result(self):
         """
-        Find the result of an equation (should call a parsing function)
-        but currently just uses the default python eval function.
+        Find the result of an equation using the expression engine.
 
         ### Returns:
         out : float or str
          The result of the equation, error if cannot be calculated
         """
-        # Have to include globals otherwise current name space is used
         result = None
-        
-        if (self.equation_str[0] == "#"): # comment
-            self.type = "comment"
-        
-        elif (self.equation_str[0].isalpha() and self.equation_str.find(":") != -1): 
-            assignment = create_assignment(self.equation_str, self.assignments)
-            
-            self.assignments[assignment[0]] = assignment[1]
-
-            self.type = "assignment"
-            if (not callable(assignment[1])):
-                result = assignment[1] # If variable report result
-        
-        else:
-            result = eval_equation(self.equation_str, self.assignments)
-            
-            
-            self.type = "equation"
-                
-        
+        self.value = None
+        self.error = None
+
+        if (metrics.ENABLED):
+            start = time.perf_counter()
+
+        try:
+            if (self.type == "assignment"):
+                assignment = create_assignment(self.equation_str, self.assignments)
+
+                self.assignments[assignment[0]] = assignment[1]
+                self.value = assignment[1]
+
+                if (not callable(assignment[1])):
+                    result = assignment[1] # If variable report result
+
+            elif (self.type == "equation"):
+                result = eval_equation(self.equation_str, self.assignments)
+
+        except Exception as error:
+            self.error = error
+            result = "error"
+
+        if (metrics.ENABLED):
+            metrics.REGISTRY.record_equation(self.key, self.equation_str, time.perf_counter() - start)
+
         return result
-    
-    def update_equation(self, equation: str):
-        """
-        Update the equation with new values essentially just a fancy
-        setter. Currently doesn't update the GUI.
 
-        ### Params:
-        equation : str
-         The new equation to update it with
+    def evaluate(self):
+        """
+        Evaluate the equation again using the current assignments.
         """
-        self.equation_str = equation
         self.result = self.__find_result()
-    
-    def delete_equation(self, event: tk.Event = None):
+        self.pending = False
+
+    def finish(self, result, value, error: Exception):
         """
-        Remove the equation from the GUI and call the outer delete
-        function if provided. This is called from the delete button.
+        Set the outcome of an evaluation done elsewhere, such as in
+        another process. A variable's value is also assigned.
 
         ### Params:
-        event : tk.Event
-         The event object used when called from the button press. 
+        result
+         The result of the equation
+        value
+         The value assigned, None if the equation isn't a variable
+        error : Exception
+         The error raised, None if successful
         """
-        self.frm_equation.destroy() # Remove the equation from the GUI
-        
-        # Remove from assignments if necessary
-        # if (self.type == "assignment"):
-        #     self.assignments.pop()
+        self.result = result
+        self.value = value
+        self.error = error
+        self.pending = False
 
-        if self.delete_function != None:
-            self.delete_function(self) # Remove the equation from the list
+        if (value is not None):
+            for name in self.writes:
+                self.assignments[name] = value
 
-    def create_equation(self, master: tk.Widget, delete_function = None):
+    def set_equation(self, equation: str):
         """
-        Create the equation GUI object. Currently places itself I 
-        dont think that is the best way of doing it.
+        Change the equation string and the names it uses without
+        evaluating it.
 
         ### Params:
-        master : tk.Widget
-         The master widget for the equation.
-        delete_function = None
-         The delete function to be called when the GUI object is destroyed.
-        """
-        # Create the equation frame
-        self.frm_equation = tk.Frame(master)
-        self.frm_equation.columnconfigure(0, weight=1)
-        self.frm_equation.config(background=rgb_to_tk(self.theme.colours.background))
-        
-        # Create the equation components
-        self.lbl_equation = tk.Label(self.frm_equation, text=self.equation_str, anchor="w")
-        self.lbl_equation.grid(row=0, column=0, sticky="new")
-        
-        if (self.result != None):
-            self.lbl_result = tk.Label(self.frm_equation, text="="+str(self.result), anchor="w")
-            self.lbl_result.grid(row=1, column=0, sticky="new")
-        else:
-            self.lbl_result = tk.Label(self.frm_equation, text="", anchor="w")
-            self.lbl_result.grid(row=1, column=0, sticky="new")
- 
-        self.btn_delete = tk.Button(self.frm_equation, command=self.delete_equation)
-        
-        self.btn_delete.grid(row=0, column=1, rowspan=2, padx=10)
-
-        # Set theme
-        self.lbl_equation.config(background=rgb_to_tk(self.theme.colours.background),
-                                 font=(self.theme.font.family, self.theme.font.size))
-
-        if (self.type == "comment"):
-            self.lbl_equation.config(foreground=rgb_to_tk(self.theme.colours.comment))
-        elif (self.type == "equation"):
-            self.lbl_equation.config(foreground=rgb_to_tk(self.theme.colours.equation))
-        elif (self.type == "assignment"):
-            self.lbl_equation.config(foreground=rgb_to_tk(self.theme.colours.assignment))
-
-
-        self.lbl_result.config(foreground=rgb_to_tk(self.theme.colours.result),
-                               background=rgb_to_tk(self.theme.colours.background),
-                               font=(self.theme.font.family, self.theme.font.size))            
+        equation : str
+         The new equation
+        """
+        self.equation_str = equation
+        self.__latex = None
+        self.seconds = None
+        self.__find_names()
 
-        self.btn_delete.config(highlightthickness=0,
-                                relief="flat",
-                                background=rgb_to_tk(self.theme.colours.delete_button),
-                                font=(self.theme.font.family, self.theme.font.size))
+    def update_equation(self, equation: str):
+        """
+        Update the equation with new values essentially just a fancy
+        setter.
 
-        # Set the delete function
-        self.delete_function = delete_function
+        ### Params:
+        equation : str
+         The new equation to update it with
+        """
+        self.set_equation(equation)
+        self.evaluate()
 
 
 if __name__ == "__main__":
     equation1 = Equation("2+2")
     print(equation1)
     equation1.update_equation("2+3")
-    print(equation1)
-
-    equation1.create_equation(tk.Tk(), 0)
-    tk.mainloop() # 2+3 \n =5
+    print(equation1) # 2+3 = 5
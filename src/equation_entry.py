@@ -6,15 +6,15 @@
 import tkinter as tk
 from tkinter import ttk
 
-from configuration import Config, ConfigDict
-from utils import rgb_to_tk
+from theme import Theme
 
 class EquationEntry(tk.Frame):
     """
     The equation entry class which contains the GUI element to 
     enter the equation.
     """
-    def __init__(self, master: tk.Widget = None, add_equation_function = None, theme_config: ConfigDict = None):
+    def __init__(self, master: tk.Widget = None, add_equation_function = None, theme_config: Theme = None,
+                 add_equations_function = None):
         """
         The constructor for the EquationEntry class
 
@@ -22,11 +22,15 @@ class EquationEntry(tk.Frame):
         master : tk.Widget
          The master frame to place the equation in
         theme_config
-         The theme config to use
+         The compiled theme to use
 
         add_equation_function : function = None
          The function used when enter is pressed to add the equation
          to the GUI.
+
+        add_equations_function : function = None
+         The function used when several lines are pasted to add all
+         of the equations to the GUI at once.
         
         ### Variables:
         outer : tk.Frame
@@ -44,25 +48,28 @@ class EquationEntry(tk.Frame):
         self.columnconfigure(0, weight=1)
 
         self.add_equation_function = add_equation_function
+        self.add_equations_function = add_equations_function
 
         # Create the equation widgets
-        self.ent_equation = tk.Entry(self)
+        self.ent_equation = tk.Entry(self, **self.theme.entry_options)
         self.ent_equation.focus_set()
         self.ent_equation.bind("<Return>", self.add_equation_CB)
         self.ent_equation.bind("<Up>", self.prev_entry_CB)
         self.ent_equation.bind("<Down>", self.next_entry_CB)
+        self.ent_equation.bind("<<Paste>>", self.paste_CB)
         self.ent_equation.grid(row=0, column=0, sticky="nsew")
 
-        # Colour scheme
-        self.ent_equation.config(background=rgb_to_tk(self.theme.colours.entry_background),
-                                 foreground=rgb_to_tk(self.theme.colours.entry_text),
-                                 relief="flat",
-                                 insertbackground="white",
-                                 highlightcolor="white",
-                                 highlightthickness=0,
-                                 insertwidth=1,
-                                 font=(self.theme.font.family, self.theme.font.size))
-                                 
+        self.theme.observers.append(self.theme_changed)
+
+    def theme_changed(self, theme: Theme):
+        """
+        Restyle the entry after the theme has changed
+
+        ### Params:
+        theme : Theme
+         The changed theme
+        """
+        self.ent_equation.config(**theme.entry_options)
 
     def add_equation_CB(self, event:tk.Event):
         """
@@ -79,14 +86,51 @@ class EquationEntry(tk.Frame):
         
         self.ent_equation.delete(0, tk.END)
 
+        self.__remember(equation_str)
+
+        if (self.add_equation_function != None):
+            self.add_equation_function(equation_str)
+
+    def __remember(self, equation_str: str):
+        """
+        Add an equation to the previous entries recalled with the arrows
+
+        ### Params:
+        equation_str : str
+         The equation entered
+        """
         if (len(self.prev_entries) > 100):
             self.prev_entries.pop(0)
 
         self.prev_entries.append(equation_str)
         self.prev_entry_idx = len(self.prev_entries)
 
-        if (self.add_equation_function != None):
-            self.add_equation_function(equation_str)
+    def paste_CB(self, event:tk.Event):
+        """
+        The callback from the equation entry box paste. A block of
+        several lines is added as equations all at once, a single
+        line is pasted into the entry as normal.
+
+        ### Params:
+        event : tk.Event
+         The unused event object
+        """
+        try:
+            text = self.clipboard_get()
+        except tk.TclError: # Nothing to paste
+            return
+
+        lines = [line.strip() for line in text.splitlines() if len(line.strip()) != 0]
+
+        if (len(lines) <= 1 or self.add_equations_function == None):
+            return
+
+        for line in lines[-100:]:
+            self.__remember(line)
+
+        self.add_equations_function(lines)
+
+        return "break" # Stop the default paste
 
 
 
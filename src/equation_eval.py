@@ -5,10 +5,341 @@
 # @brief Provide functionality to allow for evaluation of complex equations
 
 from typing import Union, Tuple
+import importlib.util
 import math
-import copy
+import sys
+import types
 
-FUNCTION_PLACEHOLDER_PARAMS = ["A192004", "B316294", "C449499", "D930100", "E733590"]
+import metrics
+from cache import LRUCache
+from expression_engine import compile_expression, compile_function, make_function, evaluate, SAFE_BUILTINS, CompiledExpression, ExpressionError
+
+## The cache of compiled equations keyed by the raw equation string
+compiled_equations = LRUCache(maxsize=1024)
+
+## The cache of compiled function bodies keyed by (name, parameters, body string)
+compiled_functions = LRUCache(maxsize=256)
+
+## The default number of results each memoised user function keeps
+MEMO_CACHE_SIZE = 256
+
+## Marks a missing entry in a memo cache lookup
+_MISSING = object()
+
+## Arrays with more elements than this are shown as a summary
+ARRAY_SUMMARY_SIZE = 10
+
+## numpy is optional, it is only imported when an array function is first used
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+## The default largest array in bytes an expression may create, see Namespace.max_array_bytes
+MAX_ARRAY_BYTES = 1 << 28
+
+class NumpyFunction():
+    """
+    A numpy function that imports numpy the first time it is called so
+    the cost of importing numpy is only paid by sessions that use arrays.
+    Arrays are limited to the max_array_bytes of the namespace holding
+    the function.
+    """
+    def __init__(self, name: str, assignments: dict = None):
+        """
+        Create a lazily imported numpy function
+
+        ### Params:
+        name : str
+         The name of the function in the numpy module
+        assignments = None
+         The namespace whose limit applies, MAX_ARRAY_BYTES if None
+        """
+        self.__name__ = name
+        self.function = None
+        self.assignments = assignments
+
+    def __call__(self, *args):
+        if (self.function is None):
+            import numpy
+            self.function = getattr(numpy, self.__name__)
+
+        limit = getattr(self.assignments, "max_array_bytes", MAX_ARRAY_BYTES)
+        self.__check_size(args, limit)
+
+        result = self.function(*args)
+
+        if (getattr(result, "nbytes", 0) > limit): # Such as arrays broadcast against each other
+            raise ExpressionError("array of " + str(result.size) + " elements is larger than the memory limit")
+
+        return result
+
+    def __check_size(self, args: tuple, limit: int):
+        """
+        Refuse to create arrays larger than the limit before they are made.
+        linspace and arange are the only ways to make an array from
+        numbers, other functions are checked once they return.
+
+        ### Params:
+        args : tuple
+         The arguments the function was called with
+        limit : int
+         The largest array in bytes
+        """
+        if (self.__name__ == "linspace"):
+            elements = args[2] if len(args) > 2 else 50
+        elif (self.__name__ == "arange" and len(args) != 0):
+            start, stop, step = (0, args[0], 1) if len(args) == 1 else (args + (1,))[:3]
+            elements = math.ceil((stop - start) / step) if step != 0 else 0
+        else:
+            return
+
+        if (elements * 8 > limit):
+            raise ExpressionError("array of " + str(elements) + " elements is larger than the memory limit")
+
+    def __repr__(self):
+        return "<function " + self.__name__ + ">"
+
+class ArrayAware():
+    """
+    A default function that uses the fast scalar version for numbers
+    and falls back to the numpy version when given an array.
+    """
+    def __init__(self, scalar_function: callable, array_function: callable):
+        """
+        Create an array aware function
+
+        ### Params:
+        scalar_function : callable
+         The function used for plain numbers
+        array_function : callable
+         The vectorised function used for arrays
+        """
+        self.__name__ = scalar_function.__name__
+        self.scalar_function = scalar_function
+        self.array_function = array_function
+
+    def __call__(self, x):
+        try:
+            return self.scalar_function(x)
+        except TypeError: # Arrays can't be converted to a float
+            return self.array_function(x)
+
+    def __repr__(self):
+        return "<function " + self.__name__ + ">"
+
+def format_result(result) -> str:
+    """
+    Convert a result into the text shown to the user. Large arrays are
+    summarised rather than printed in full.
+
+    ### Params:
+    result
+     The result of an equation
+
+    ### Returns:
+    out : str
+     The result text
+    """
+    np = sys.modules.get("numpy") # If numpy isn't imported the result can't be an array
+    if (np is not None and isinstance(result, np.ndarray) and result.size > ARRAY_SUMMARY_SIZE):
+        first = ", ".join(str(value) for value in result.flat[:3])
+        return (f"array(shape={result.shape}, min={result.min()}, max={result.max()}, "
+                f"[{first}, ...])")
+
+    try:
+        return str(result)
+    except ValueError: # Python refuses to convert huge integers to text
+        return f"<{result.bit_length()} bit integer>"
+
+class MemoisedFunction():
+    """
+    Wraps a user function with an LRU cache of its results. The cache is
+    cleared by the Namespace when a name the function depends on is
+    redefined.
+    """
+    def __init__(self, name: str, function: callable, maxsize: int = MEMO_CACHE_SIZE):
+        """
+        Create a memoised function
+
+        ### Params:
+        name : str
+         The name the function is assigned to
+        function : callable
+         The native function to wrap
+        maxsize : int = MEMO_CACHE_SIZE
+         The maximum number of results to keep
+        """
+        self.__name__ = name
+        self.function = function
+        self.cache = LRUCache(maxsize)
+
+    def __call__(self, *args):
+        # 1, 1.0 and True are equal so the types are part of the key
+        key = (args, tuple(map(type, args)))
+
+        try:
+            result = self.cache.get(key, _MISSING)
+        except TypeError: # Unhashable arguments can't be cached
+            return self.function(*args)
+
+        if (result is _MISSING):
+            result = self.function(*args)
+            self.cache.put(key, result)
+
+        return result
+
+    def __repr__(self):
+        return "<memoised function " + self.__name__ + ">"
+
+class Namespace(dict):
+    """
+    The dictionary of functions and variables available to equations
+    which clears the caches of memoised functions when a name they
+    depend on (directly or through another function) is redefined.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        ## The names each user function reads
+        self.dependencies : dict[str, frozenset] = dict()
+        ## The user functions reading each name
+        self.dependents : dict[str, set] = dict()
+
+        self.memo_size = MEMO_CACHE_SIZE
+
+        ## The largest array in bytes an expression may create
+        self.max_array_bytes = MAX_ARRAY_BYTES
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        self.invalidate(name)
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.invalidate(name)
+
+    def pop(self, name, *default):
+        value = super().pop(name, *default)
+        self.invalidate(name)
+        return value
+
+    def depends(self, name: str, dependencies: frozenset):
+        """
+        Record the names an assignment reads replacing any previous record.
+
+        ### Params:
+        name : str
+         The name being assigned
+        dependencies : frozenset
+         The names its definition reads
+        """
+        for dependency in self.dependencies.pop(name, ()):
+            self.dependents[dependency].discard(name)
+
+        if (len(dependencies) != 0):
+            self.dependencies[name] = dependencies
+
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(name)
+
+    def invalidate(self, name: str, seen: set = None):
+        """
+        Clear the cache of every memoised function depending on name
+        directly or through other functions.
+
+        ### Params:
+        name : str
+         The name that has changed
+        seen : set = None
+         The names already visited
+        """
+        dependents = self.dependents.get(name)
+        if (not dependents):
+            return
+
+        if (seen is None):
+            seen = set()
+
+        for dependent in list(dependents):
+            if (dependent not in seen):
+                seen.add(dependent)
+
+                function = self.get(dependent)
+                if (isinstance(function, MemoisedFunction)):
+                    function.cache.clear()
+
+                self.invalidate(dependent, seen)
+
+    def set_memo_size(self, maxsize: int):
+        """
+        Change the cache size of new and existing memoised functions.
+
+        ### Params:
+        maxsize : int
+         The maximum number of results each function keeps
+        """
+        self.memo_size = maxsize
+
+        for function in self.memoised_functions():
+            function.cache.resize(maxsize)
+
+    def memoised_functions(self) -> list:
+        """
+        Get the memoised functions currently assigned
+
+        ### Returns:
+        out : list
+         The MemoisedFunction objects in the namespace
+        """
+        return [value for value in self.values() if isinstance(value, MemoisedFunction)]
+
+    def cache_stats(self) -> dict:
+        """
+        Get the cache statistics of every memoised function
+
+        ### Returns:
+        out : dict
+         The cache info of each function keyed by its name
+        """
+        return {function.__name__: function.cache.info() for function in self.memoised_functions()}
+
+def normalise_equation(equation_str: str) -> str:
+    """
+    Convert the calculator syntax into python syntax. ^ is power and 
+    ^^ is xor.
+
+    ### Params:
+    equation_str
+     The equation string
+
+    ### Returns:
+    out
+     The python equivalent of the equation string
+    """
+    equation_str = equation_str.replace("^^", "__XOR__")
+    equation_str = equation_str.replace("^", "**")
+    equation_str = equation_str.replace("__XOR__", "^")
+
+    return equation_str
+
+def compile_equation(equation_str: str) -> CompiledExpression:
+    """
+    Compile an equation string using the expression engine, reusing the
+    cached expression if the same string has been compiled before.
+
+    ### Params:
+    equation_str
+     The equation string
+
+    ### Returns:
+    expression
+     The compiled expression ready to be evaluated
+    """
+    expression = compiled_equations.get(equation_str)
+
+    if (expression is None):
+        expression = compile_expression(normalise_equation(equation_str))
+        compiled_equations.put(equation_str, expression)
+
+    return expression
 
 def eval_equation(equation_str: str, assignments: dict) -> float:
     """
@@ -24,16 +355,80 @@ def eval_equation(equation_str: str, assignments: dict) -> float:
     result
      The result of the equation
     """
-    equation_str = equation_str.replace("^^", "__XOR__")
-    equation_str = equation_str.replace("^", "**")
-    equation_str = equation_str.replace("__XOR__", "^")
-    
-    # try: 
-    result = eval(equation_str, assignments) # Should never actually do this
-    # except:
-    #     result = "error"
+    return evaluate(compile_equation(equation_str), assignments)
+
+def compile_user_function(name: str, parameters: list, assigne: str) -> CompiledExpression:
+    """
+    Compile the body of a function assignment, reusing the cached
+    expression so finding its names and creating it only compile once.
+
+    ### Params:
+    name
+     The name of the function
+    parameters
+     The parameter names in order
+    assigne
+     The text of the function body
 
-    return result
+    ### Returns:
+    expression
+     The compiled expression from compile_function
+    """
+    key = (name, tuple(parameters), assigne)
+    expression = compiled_functions.get(key)
+
+    if (expression is None):
+        expression = compile_function(name, parameters, normalise_equation(assigne))
+        compiled_functions.put(key, expression)
+
+    return expression
+
+def split_assignment(equation_str: str) -> Tuple[str, Union[list, None], str]:
+    """
+    Split an assignment into its parts
+
+    ### Params:
+    equation_str
+     The equation string
+
+    ### Returns:
+    (name, parameters, assigne)
+     The name being assigned, the list of parameter names (None for a
+     variable) and the text of the assigned expression
+    """
+    split_eq_str = equation_str.split(":=")
+    name = split_eq_str[0].strip()
+    name = name.split("(")[0] # remove function brackets
+
+    assigne = split_eq_str[1]
+    parameters = None
+
+    if (equation_str.find("(") < equation_str.find(":") and equation_str.find("(") != -1): # Function
+        signature = split_eq_str[0]
+        parameters = signature[signature.find("(")+1:signature.rfind(")")].split(",")
+        parameters = [param.strip() for param in parameters if len(param.strip()) != 0]
+
+    return (name, parameters, assigne)
+
+def assignment_names(equation_str: str) -> Tuple[str, frozenset]:
+    """
+    Find the name an assignment writes and the names it reads without
+    evaluating it.
+
+    ### Params:
+    equation_str
+     The equation string
+
+    ### Returns:
+    (name, reads)
+     The name assigned and the names read by the assigned expression
+    """
+    name, parameters, assigne = split_assignment(equation_str)
+
+    if (parameters is not None):
+        return (name, compile_user_function(name, parameters, assigne).names)
+    else:
+        return (name, compile_equation(assigne).names)
 
 def create_assignment(equation_str: str, assignments: dict) -> Tuple[str, Union[callable, float]]:
     """
@@ -49,41 +444,35 @@ def create_assignment(equation_str: str, assignments: dict) -> Tuple[str, Union[
     (name, assignment)
      The name of the assignment and the assignment ether variable or callable
     """
-    split_eq_str = equation_str.split(":=")
-    name = split_eq_str[0].strip()
-    name = name.split("(")[0] # remove function brackets
-
-    assigne = split_eq_str[1]
+    name, parameters, assigne = split_assignment(equation_str)
     assignment = None
 
-    if (equation_str.find("(") < equation_str.find(":") and equation_str.find("(") != -1): # Function
-        parameters = split_eq_str[0][split_eq_str[0].find("(")+1:-1].split(",")
-        parameters = [param.strip() for param in parameters]
-
-        # Replace parameters with placeholder names
-        for i in range(len(parameters)):
-            assigne = assigne.replace(parameters[i], FUNCTION_PLACEHOLDER_PARAMS[i])
-
-        def f(A192004=0, B316294=0, C449499=0, D930100=0, E733590=0, assigne=assigne, assignments=assignments):
-            """
-            The function to save. This uses random parameters (up to 5) to ensure no collisions
-            """
-            assignments = copy.deepcopy(assignments)
-            
-            # Add temp placeholders to allow function to execute
-            assignments["A192004"] = A192004
-            assignments["B316294"] = B316294
-            assignments["C449499"] = C449499
-            assignments["D930100"] = D930100
-            assignments["E733590"] = E733590
-
-            return eval_equation(assigne, assignments)
-        
-        assignment = f
+    if (parameters is not None): # Function
+        # Compile once into a native function with real parameters
+        expression = compile_user_function(name, parameters, assigne)
+        assignment = make_function(name, expression, assignments)
+
+        if (metrics.ENABLED):
+            assignment = metrics.TimedFunction(name, assignment)
+
+        # Functions that call other user functions (or themselves) are worth
+        # memoising, calls to builtins like sin are cheaper than a lookup
+        if (isinstance(assignments, Namespace)):
+            assignments.depends(name, expression.names)
+
+            if (any(call not in assignments or isinstance(assignments[call], (types.FunctionType, MemoisedFunction, metrics.TimedFunction))
+                    for call in expression.calls)):
+                assignment = MemoisedFunction(name, assignment, assignments.memo_size)
+
+                if (isinstance(assignment.function, metrics.TimedFunction)):
+                    assignment.function.record.cache = assignment.cache
 
     else: # variable
         assignment = eval_equation(assigne, assignments)
 
+        if (isinstance(assignments, Namespace)):
+            assignments.depends(name, frozenset())
+
     return (name, assignment)
 
 
@@ -95,9 +484,19 @@ def default_assignments(assignments: dict):
     assignments
      The empty assignments dictionary
     """
+    assignments["__builtins__"] = SAFE_BUILTINS
+
     assignments["pi"] = 3.14159265359
     assignments["sin"] = math.sin
     assignments["cos"] = math.cos
     assignments["tan"] = math.tan
 
     assignments["exp"] = math.exp
+
+    # Allow variables to hold arrays for vectorised sweeps
+    if (HAS_NUMPY):
+        for name in ["sin", "cos", "tan", "exp"]:
+            assignments[name] = ArrayAware(assignments[name], NumpyFunction(name, assignments))
+
+        assignments["linspace"] = NumpyFunction("linspace", assignments)
+        assignments["arange"] = NumpyFunction("arange", assignments)
@@ -0,0 +1,149 @@
+##
+# @file equation_view.py
+# @brief the EquationView class for the printingCalc project
+# @details This file contains the EquationView class, which displays an Equation in the GUI
+# @author Jack Duignan (JackpDuignan@gmail.com)
+
+import tkinter as tk
+from tkinter import ttk
+
+from equation import Equation
+from theme import Theme
+
+class EquationView(ttk.Frame):
+    """
+    The GUI object for an equation showing the equation, its result and
+    a delete button.
+    """
+    def __init__(self, master: tk.Widget, equation: Equation, theme_config: Theme = None,
+                 delete_function = None, edit_function = None, select_function = None):
+        """
+        Create the equation GUI object. The caller places it.
+
+        ### Params:
+        master : tk.Widget
+         The master widget for the equation.
+        equation : Equation
+         The equation to display
+        theme_config
+         The compiled theme to use
+        delete_function = None
+         The delete function to be called with the equation when the delete button is pressed.
+        edit_function = None
+         The edit function to be called with the equation when it is double clicked.
+        select_function = None
+         The select function to be called with the equation when it is control clicked.
+        """
+        super().__init__(master, style="Row.TFrame")
+
+        self.equation = equation
+        self.theme = theme_config
+        self.selected = False
+
+        # Create the equation frame
+        self.columnconfigure(0, weight=1)
+
+        # Create the equation components, the theme is applied through the shared styles
+        self.lbl_equation = ttk.Label(self, text=self.equation.equation_str,
+                                      style=self.theme.equation_style(self.equation.type))
+        self.lbl_equation.grid(row=0, column=0, sticky="new")
+        self.lbl_equation.bind("<Double-Button-1>", self.edit_equation)
+
+        self.lbl_result = ttk.Label(self, text=self.equation.result_text(), style="Result.TLabel")
+        self.lbl_result.grid(row=1, column=0, sticky="new")
+
+        for label in [self.lbl_equation, self.lbl_result]:
+            label.bind("<Control-Button-1>", self.select_equation)
+
+        # A styled label rather than a tk.Button so a new theme reaches every row through the style
+        self.btn_delete = ttk.Label(self, text="  ", style="Delete.TLabel", cursor="hand2")
+        self.btn_delete.bind("<Button-1>", self.delete_equation)
+        self.btn_delete.grid(row=0, column=1, rowspan=2, padx=10)
+
+        # Set the delete, edit and select functions
+        self.delete_function = delete_function
+        self.edit_function = edit_function
+        self.select_function = select_function
+
+    def set_equation(self, equation: Equation):
+        """
+        Show a different equation in this GUI object so it can be reused.
+
+        ### Params:
+        equation : Equation
+         The equation to display
+        """
+        self.equation = equation
+        self.refresh()
+
+    def refresh(self):
+        """
+        Update the GUI object to show the current equation and result.
+        """
+        self.lbl_equation.config(text=self.equation.equation_str,
+                                 style=self.theme.equation_style(self.equation.type))
+        self.lbl_result.config(text=self.equation.result_text())
+
+    def set_selected(self, selected: bool):
+        """
+        Show whether the equation is selected, the selected state changes
+        the background through the row styles.
+
+        ### Params:
+        selected : bool
+         True if the equation is selected
+        """
+        if (selected == self.selected):
+            return
+
+        self.selected = selected
+        state = ["selected"] if selected else ["!selected"]
+
+        for widget in [self, self.lbl_equation, self.lbl_result]:
+            widget.state(state)
+
+    def select_equation(self, event: tk.Event = None):
+        """
+        Call the outer select function if provided. This is called when
+        the equation is control clicked.
+
+        ### Params:
+        event : tk.Event
+         The event object used when called from the click.
+        """
+        if self.select_function != None:
+            self.select_function(self.equation)
+
+    def delete_equation(self, event: tk.Event = None):
+        """
+        Call the outer delete function if provided which removes the
+        equation from the GUI. This is called from the delete button.
+
+        ### Params:
+        event : tk.Event
+         The event object used when called from the button press.
+        """
+        if self.delete_function != None:
+            self.delete_function(self.equation) # Remove the equation from the list
+
+    def edit_equation(self, event: tk.Event = None):
+        """
+        Call the outer edit function if provided. This is called when
+        the equation is double clicked.
+
+        ### Params:
+        event : tk.Event
+         The event object used when called from the double click.
+        """
+        if self.edit_function != None:
+            self.edit_function(self.equation)
+
+
+if __name__ == "__main__":
+    from configuration import Config
+
+    equation1 = Equation("2+3")
+
+    root = tk.Tk()
+    EquationView(root, equation1, Theme(Config.load_frozen_json("theme.json"), root)).grid()
+    tk.mainloop() # 2+3 \n =5
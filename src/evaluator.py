@@ -0,0 +1,156 @@
+## @file evaluator.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Run worksheet changes on a worker thread so the GUI never waits
+#  @details Jobs are run one at a time in the order they are submitted.
+#  The GUI calls poll() from tk's after() to hand finished jobs back on
+#  its own thread and to stop evaluations that run over the time limit.
+#  This file has no GUI code.
+
+import queue
+import threading
+import time
+
+from expression_engine import INTERRUPTER, EvaluationCancelled, EvaluationTimeout
+
+## The default number of seconds a job may evaluate for
+DEFAULT_TIME_LIMIT = 10.0
+
+class Job():
+    """
+    A function to run on the worker along with its outcome
+    """
+    __slots__ = ("function", "args", "done_function", "result", "error")
+
+    def __init__(self, function: callable, args: tuple, done_function: callable = None):
+        """
+        Create a job
+
+        ### Params:
+        function : callable
+         The function to run on the worker
+        args : tuple
+         The arguments to call it with
+        done_function = None
+         Called with the job on the polling thread once it has finished
+
+        ### Variables:
+        result
+         The value returned by the function
+
+        error : Exception
+         The exception raised by the function, None if it succeeded
+        """
+        self.function = function
+        self.args = args
+        self.done_function = done_function
+        self.result = None
+        self.error = None
+
+class Evaluator():
+    """
+    A worker thread that runs jobs in order with a time limit on each
+    evaluation, a job such as a recalculation can run many.
+    Only one evaluator can run at a time as evaluations are interrupted
+    through the engine's INTERRUPTER.
+    """
+    def __init__(self, time_limit: float = DEFAULT_TIME_LIMIT):
+        """
+        Create an evaluator and start its worker thread. The memory limit
+        belongs to each worksheet, see Worksheet.set_memory_limit.
+
+        ### Params:
+        time_limit = DEFAULT_TIME_LIMIT
+         The seconds an evaluation may run for before it is stopped
+
+        ### Variables:
+        running : Job
+         The job being run by the worker, None when idle
+        """
+        self.jobs = queue.Queue()
+        self.finished = queue.Queue()
+        self.running = None
+        self.time_limit = time_limit
+
+        self.thread = threading.Thread(target=self.__work, name="evaluator", daemon=True)
+        self.thread.start()
+
+    def __work(self):
+        """
+        Run jobs forever, called on the worker thread.
+        """
+        INTERRUPTER.thread_id = threading.get_ident()
+
+        while (True):
+            job = self.jobs.get()
+
+            self.running = job
+
+            try:
+                job.result = job.function(*job.args)
+            except Exception as error:
+                job.error = error
+            finally:
+                self.running = None
+                self.finished.put(job)
+
+    @property
+    def busy(self) -> bool:
+        """ True if there are jobs waiting or running """
+        return self.running is not None or not self.jobs.empty()
+
+    def submit(self, function: callable, *args, done_function: callable = None) -> Job:
+        """
+        Add a job to the end of the queue
+
+        ### Params:
+        function : callable
+         The function to run on the worker
+        args
+         The arguments to call it with
+        done_function = None
+         Called with the job by poll() once it has finished
+
+        ### Returns:
+        job : Job
+         The submitted job
+        """
+        job = Job(function, args, done_function)
+        self.jobs.put(job)
+
+        return job
+
+    def cancel(self) -> bool:
+        """
+        Stop the evaluation running now, the equation shows an error and
+        the rest of the job carries on.
+
+        ### Returns:
+        cancelled : bool
+         True if an evaluation was running
+        """
+        return INTERRUPTER.interrupt(EvaluationCancelled)
+
+    def poll(self) -> int:
+        """
+        Stop an evaluation that is over the time limit and call the done
+        functions of the finished jobs. Call this regularly from the thread
+        that submits jobs.
+
+        ### Returns:
+        count : int
+         The number of jobs finished
+        """
+        if (self.running is not None):
+            INTERRUPTER.interrupt(EvaluationTimeout, time.monotonic() - self.time_limit)
+
+        count = 0
+        while (True):
+            try:
+                job = self.finished.get_nowait()
+            except queue.Empty:
+                return count
+
+            count += 1
+            if (job.done_function != None):
+                job.done_function(job)
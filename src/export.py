@@ -4,48 +4,121 @@
 #  @brief The implementation of the export window that allows for 
 #  exporting the current history
 
+import os
+import shutil
+import threading
 import tkinter as tk
 import tkinter.messagebox as tk_msg
-import datetime
+from tkinter import ttk
 
-from configuration import Config, ConfigDict
-from utils import rgb_to_tk
 from history import History
+from formats import TxtFormat, MdFormat, LatexFormat
+from theme import Theme
 
-def export_txt(history: History, filename: str, title: str, comment: str):
+## The number of equations formatted between each write and progress update
+EXPORT_BATCH_SIZE = 4096
+
+class ExportCancelled(Exception):
     """
-    Export the current history as a txt file
+    Raised when an export is cancelled before it finishes
+    """
+    pass
+
+def export_chunks(equations, output_format, title: str, comment: str):
+    """
+    Generate the text of an export in large chunks so it can be written
+    with a few big writes.
+
+    ### Params:
+    equations
+     The equations to export in order
+    output_format
+     The format object from formats.py
+    title
+     The title to write at the beginning of the file
+    comment
+     The comment to add after the title
+
+    ### Returns:
+    (text, count)
+     Yields each chunk of text and the number of equations in it
+    """
+    yield (output_format.header(title, comment), 0)
+
+    batch = list()
+    for equation in equations:
+        batch.append(output_format.equation(equation))
+
+        if (len(batch) == EXPORT_BATCH_SIZE):
+            yield ("".join(batch), len(batch))
+            batch = list()
+
+    yield ("".join(batch), len(batch))
+    yield (output_format.footer(), 0)
+
+def export_as(history: History, full_filename: str, output_format, title: str, comment: str,
+              progress = None, cancel: threading.Event = None):
+    """
+    Export the current history using the given format. The file is
+    written to a temporary file first which then replaces the target so
+    it is never left half written.
 
     ### Params:
     history
         The history to save
-    filename
-        The filename to save to (without type)
+    full_filename
+        The filename to save to (with type)
+    output_format
+        The format object from formats.py
     title
         The title to write at the beginning of the file
     comment
         The comment to add after the title
+    progress = None
+        Called with (done, total) equations after each chunk is written
+    cancel = None
+        The export stops and raises ExportCancelled once this event is set
     """
-    full_filename = filename + ".txt"
+    total = len(history.equations)
+    done = 0
+
+    directory = os.path.dirname(os.path.abspath(full_filename))
+
+    # Created like the target would be so the umask applies to its mode
+    while (True):
+        temp_filename = os.path.join(directory, ".pc-export-" + os.urandom(4).hex() + ".tmp")
+        try:
+            handle = os.open(temp_filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+            break
+        except FileExistsError:
+            pass
+
+    try:
+        with os.fdopen(handle, "w", buffering=1 << 16) as f:
+            for text, count in export_chunks(history.equations, output_format, title, comment):
+                if (cancel is not None and cancel.is_set()):
+                    raise ExportCancelled()
+
+                f.write(text)
+                done += count
 
-    with open(full_filename, "w") as f:
-        if (len(title) != 0):
-            f.write("Title: " + title + "\n\n")
-        if (len(comment) != 0):
-            f.write("Comment:\n" + comment + "\n\n")
+                if (progress != None):
+                    progress(done, total)
 
-        for equation in history.equations:
-            if (equation.type == "comment"):
-                f.write(equation.equation_str[1:].strip() + "\n")
-            elif (equation.type == "equation"):
-                f.write(equation.equation_str + "\n")
-                f.write("= " + str(equation.result) + "\n")
+        # Keep the mode of a file being replaced
+        if (os.path.exists(full_filename)):
+            shutil.copymode(full_filename, temp_filename)
 
-        f.write("\n-- Printing Calc History --" + "\n" + "Export Time: " + str(datetime.datetime.now())[:-7])
+        os.replace(temp_filename, full_filename)
 
-def export_md(history: History, filename: str, title: str, comment: str):
+    except BaseException:
+        os.remove(temp_filename)
+        raise
+
+def export_txt(history: History, filename: str, title: str, comment: str,
+               progress = None, cancel: threading.Event = None):
     """
-    Export the current history as a markdown file
+    Export the current history as a txt file
 
     ### Params:
     history
@@ -56,40 +129,81 @@ def export_md(history: History, filename: str, title: str, comment: str):
         The title to write at the beginning of the file
     comment
         The comment to add after the title
+    progress = None
+        Called with (done, total) equations as the export is written
+    cancel = None
+        The event used to cancel the export
     """
-    full_filename = filename + ".md"
+    export_as(history, filename + ".txt", TxtFormat(), title, comment, progress, cancel)
 
-    with open(full_filename, "w") as f:
-        if (len(title) != 0):
-            f.write("# " + title + "\n\n")
-        if (len(comment) != 0):
-            f.write(comment.replace("\n", "\n\n") + "\n\n")
+def export_md(history: History, filename: str, title: str, comment: str,
+              progress = None, cancel: threading.Event = None):
+    """
+    Export the current history as a markdown file
 
-        f.write("### Content: \n\n")
+    ### Params:
+    history
+        The history to save
+    filename
+        The filename to save to (without type)
+    title
+        The title to write at the beginning of the file
+    comment
+        The comment to add after the title
+    progress = None
+        Called with (done, total) equations as the export is written
+    cancel = None
+        The event used to cancel the export
+    """
+    export_as(history, filename + ".md", MdFormat(), title, comment, progress, cancel)
 
-        for equation in history.equations:
-            if (equation.type == "comment"):
-                f.write(equation.equation_str[1:].strip() + "\n\n")
-            elif (equation.type == "equation"):
-                f.write("$$\n")
-                f.write(equation.equation_str + "\n")
-                f.write("= " + str(equation.result) + "\n")
-                f.write("$$\n\n")
+def export_latex(history: History, filename: str, title: str, comment: str,
+                 progress = None, cancel: threading.Event = None):
+    """
+    Export the current history as a LaTeX document
 
-        f.write("---\n")
-        f.write("\n ### Printing Calc History" + "\n\n" + "**Export Time:** " + str(datetime.datetime.now())[:-7])
+    ### Params:
+    history
+        The history to save
+    filename
+        The filename to save to (without type)
+    title
+        The title to write at the beginning of the file
+    comment
+        The comment to add after the title
+    progress = None
+        Called with (done, total) equations as the export is written
+    cancel = None
+        The event used to cancel the export
+    """
+    export_as(history, filename + ".tex", LatexFormat(), title, comment, progress, cancel)
 
 class ExportWindow(tk.Toplevel):
     """
     The export window main class which creates the window etc.
     """
-    def __init__(self, history: History, theme_config: ConfigDict = None) -> None:
+    def __init__(self, history: History, theme_config: Theme = None) -> None:
         """
         Create an export window
 
         ### Params:
         history : History
          The history to use in the export
+        theme_config
+         The compiled theme
+
+        ### Variables:
+        worker : threading.Thread
+         The thread writing the export, None until the first export
+
+        cancel_event : threading.Event
+         Set to cancel the running export
+
+        progress : tuple
+         The (done, total) equations written by the running export
+
+        error : Exception
+         The error raised by the last export, None if it succeeded
         """
         super().__init__()
 
@@ -97,7 +211,14 @@ class ExportWindow(tk.Toplevel):
 
         self.theme = theme_config
 
+        self.worker = None
+        self.cancel_event = None
+        self.progress = (0, 0)
+        self.error = None
+        self.poll_id = None
+
         self.create_window()
+        self.protocol("WM_DELETE_WINDOW", self.close)
         
 
     def create_window(self):
@@ -110,11 +231,10 @@ class ExportWindow(tk.Toplevel):
         self.columnconfigure(2, weight=1)
 
         self.title("Export History")
-        self.config(background=rgb_to_tk(self.theme.colours.background))
 
-        self.minsize(300, 300)
+        self.minsize(300, 320)
         self.maxsize(800, 600)
-        self.geometry("300x300")
+        self.geometry("300x320")
 
         self.lbl_filename = tk.Label(self, text="Filename:", anchor="w", padx=0)
         self.lbl_filename.grid(row=0, column=0, sticky="nsew")
@@ -134,7 +254,7 @@ class ExportWindow(tk.Toplevel):
         self.txt_comment = tk.Text(self, height=5, width=52)
         self.txt_comment.grid(row=3, column=0, sticky="nsew", columnspan=3)
 
-        formats = ["Markdown", "Latex (Not Implemented)", "Plain Text"]
+        formats = ["Markdown", "Latex", "Plain Text"]
         self.str_sel_format = tk.StringVar(self)
         self.str_sel_format.set(formats[2])
 
@@ -144,35 +264,44 @@ class ExportWindow(tk.Toplevel):
         self.btn_export = tk.Button(self, command=self.export_history, text="Export")
         self.btn_export.grid(row = 4, column=1, sticky="ns", padx=40, columnspan=2)
 
-        # Apply Theme
+        self.prg_export = ttk.Progressbar(self, orient="horizontal", mode="determinate")
+        self.prg_export.grid(row=5, column=0, sticky="ew", columnspan=3)
+
+        self.apply_theme(self.theme)
+        self.theme.observers.append(self.apply_theme)
+
+    def apply_theme(self, theme: Theme):
+        """
+        Style the window's widgets, called again when the theme changes
+
+        ### Params:
+        theme : Theme
+         The compiled theme
+        """
+        self.config(background=theme.colours.background)
+
         for entry in [self.ent_filename, self.ent_title, self.txt_comment]:
-            entry.config(background=rgb_to_tk(self.theme.colours.entry_background),
-                        foreground=rgb_to_tk(self.theme.colours.entry_text),
-                        relief="flat",
-                        insertbackground="white",
-                        highlightcolor="white",
-                        highlightthickness=0,
-                        insertwidth=1,
-                        font=(self.theme.font.family, self.theme.font.size))
+            entry.config(**theme.entry_options)
         
         for label in [self.lbl_filename, self.lbl_title, self.lbl_comment]:
-            label.config(background=rgb_to_tk(self.theme.colours.background),
-                        foreground=rgb_to_tk(self.theme.colours.comment),
-                        font=(self.theme.font.family, self.theme.font.size))
+            label.config(**theme.label_options)
 
         for button in [self.btn_export, self.drp_format]:
-            button.config(background=rgb_to_tk(self.theme.colours.other_button_background),
-                        foreground=rgb_to_tk(self.theme.colours.other_button_text),
-                        font=(self.theme.font.family, self.theme.font.size))
+            button.config(**theme.button_options)
 
     def export_history(self, event: tk.Event = None):
         """
-        Export the history to the selected file format.
+        Export the history to the selected file format on a background
+        thread, pressing the button again cancels the export.
 
         ### Params:
         event : tk.Event
          The event object.
         """
+        if (self.worker is not None and self.worker.is_alive()):
+            self.cancel_event.set()
+            return
+
         # Get and Check file name
         filename: str = self.ent_filename.get()
         
@@ -191,9 +320,88 @@ class ExportWindow(tk.Toplevel):
 
         # Export
         if (self.str_sel_format.get() == "Plain Text"):
-            export_txt(self.history, filename, title, comment)
+            export_function = export_txt
         elif (self.str_sel_format.get() == "Markdown"):
-            export_md(self.history, filename, title, comment)
+            export_function = export_md
+        elif (self.str_sel_format.get() == "Latex"):
+            export_function = export_latex
+        else:
+            return
+
+        self.cancel_event = threading.Event()
+        self.progress = (0, len(self.history.equations))
+        self.error = None
+
+        self.worker = threading.Thread(target=self.__run_export, daemon=True,
+                                       args=(export_function, filename, title, comment))
+        self.worker.start()
+
+        self.btn_export.config(text="Cancel")
+        self.__poll_export()
+
+    def __run_export(self, export_function, filename: str, title: str, comment: str):
+        """
+        Run an export, called on the worker thread so no tk calls are made.
+
+        ### Params:
+        export_function
+         The export function to use
+        filename
+         The filename to save to (without type)
+        title
+         The title to write at the beginning of the file
+        comment
+         The comment to add after the title
+        """
+        try:
+            export_function(self.history, filename, title, comment,
+                            progress=self.__set_progress, cancel=self.cancel_event)
+        except ExportCancelled:
+            pass
+        except Exception as error:
+            self.error = error
+
+    def __set_progress(self, done: int, total: int):
+        """
+        Record the progress of the export, called on the worker thread.
+
+        ### Params:
+        done : int
+         The number of equations written
+        total : int
+         The number of equations to write
+        """
+        self.progress = (done, total)
+
+    def __poll_export(self):
+        """
+        Show the progress of the export until it finishes.
+        """
+        done, total = self.progress
+        self.prg_export.config(maximum=max(total, 1), value=done)
+
+        if (self.worker.is_alive()):
+            self.poll_id = self.after(50, self.__poll_export)
+            return
+
+        self.poll_id = None
+        self.btn_export.config(text="Export")
+
+        if (self.error is not None):
+            tk_msg.showerror(title="Export Failed", parent=self, message="Export Failed:\n" + str(self.error))
+
+    def close(self):
+        """
+        Cancel any running export and close the window
+        """
+        if (self.cancel_event is not None):
+            self.cancel_event.set()
+
+        if (self.poll_id is not None):
+            self.after_cancel(self.poll_id)
+
+        self.theme.observers.remove(self.apply_theme)
+        self.destroy()
     
     
 
@@ -0,0 +1,412 @@
+##
+# @file expression_engine.py
+# @author Jack Duignan (JackpDuignan@gmail.com)
+# @date 2024-10-05
+# @brief A restricted expression engine that replaces the raw use of eval
+# @details Expressions are parsed into an AST once, checked against a
+# whitelist of operators and then compiled into a code object that can
+# only see the assignments namespace (no python builtins).
+
+import ast
+import threading
+import time
+
+## The maximum number of bits an integer power or shift may produce
+MAX_RESULT_BITS = 1 << 20
+
+class ExpressionError(ValueError):
+    """
+    Raised when an expression uses syntax the engine does not allow.
+    """
+    pass
+
+class EvaluationCancelled(Exception):
+    """
+    Raised inside an evaluation that was cancelled from another thread.
+    """
+    pass
+
+class EvaluationTimeout(EvaluationCancelled):
+    """
+    Raised inside an evaluation that ran for longer than its time limit.
+    """
+    pass
+
+class Interrupter():
+    """
+    Lets another thread stop the evaluation running on one thread by
+    raising an exception inside it. The exception is only raised while
+    an expression is being evaluated so the code around it is never
+    interrupted part way through.
+    """
+    def __init__(self):
+        """
+        Create an interrupter
+
+        ### Variables:
+        thread_id : int
+         The ident of the thread whose evaluations can be interrupted
+
+        started : float
+         The time.monotonic() the running evaluation started
+        """
+        self.thread_id = None
+        self.lock = threading.Lock()
+        self.evaluating = False
+        self.interrupted = False
+        self.started = 0.0
+
+    def run(self, code, namespace: dict):
+        """
+        Evaluate code so that it can be interrupted
+
+        ### Params:
+        code
+         The compiled code
+        namespace : dict
+         The globals for the code
+        """
+        return self.call(eval, code, namespace)
+
+    def call(self, function: callable, *args):
+        """
+        Call a function so that it can be interrupted, the function runs
+        on the calling thread which should be thread_id.
+
+        ### Params:
+        function : callable
+         The function to call
+        args
+         The arguments to call it with
+
+        ### Returns:
+        result
+         The value returned by the function
+        """
+        if (threading.get_ident() != self.thread_id or self.evaluating): # Nested calls are part of the outer one
+            return function(*args)
+
+        with self.lock:
+            self.evaluating = True
+            self.started = time.monotonic()
+
+        try:
+            return function(*args)
+        finally:
+            # The exception can still be raised here after the function has
+            # returned, keep trying until it is cleared so it can't escape
+            # into the code after the evaluation
+            while (True):
+                try:
+                    self.__stop()
+                    break
+                except EvaluationCancelled:
+                    pass
+
+    def __stop(self):
+        """
+        Stop allowing interrupts and drop an exception that wasn't raised
+        in time. Once this returns no exception can be raised in the thread.
+        """
+        with self.lock:
+            self.evaluating = False
+
+            if (self.interrupted):
+                import ctypes
+
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id), None)
+                self.interrupted = False
+
+    def interrupt(self, exception: type = EvaluationCancelled, started_before: float = None) -> bool:
+        """
+        Raise an exception in the running evaluation, called from another thread
+
+        ### Params:
+        exception = EvaluationCancelled
+         The exception type to raise
+        started_before = None
+         Only interrupt an evaluation that started before this
+         time.monotonic(), any evaluation if None
+
+        ### Returns:
+        interrupted : bool
+         True if an evaluation was running
+        """
+        with self.lock:
+            if (not self.evaluating or self.thread_id is None):
+                return False
+
+            if (started_before is not None and self.started >= started_before):
+                return False
+
+            import ctypes # Only loaded once something is interrupted
+
+            self.interrupted = True
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread_id), ctypes.py_object(exception))
+
+            return True
+
+## The interrupter used by evaluate, set its thread_id to make a thread's evaluations interruptible
+INTERRUPTER = Interrupter()
+
+ALLOWED_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+                  ast.Pow, ast.BitXor, ast.BitAnd, ast.BitOr, ast.LShift, ast.RShift)
+ALLOWED_UNARYOPS = (ast.UAdd, ast.USub, ast.Not, ast.Invert)
+ALLOWED_CMPOPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+                 ast.IfExp, ast.Call, ast.Name, ast.Load, ast.Constant,
+                 ast.And, ast.Or) + ALLOWED_BINOPS + ALLOWED_UNARYOPS + ALLOWED_CMPOPS
+ALLOWED_CONSTANTS = (int, float, complex, bool)
+
+def guarded_pow(base, exponent):
+    """
+    Raise base to exponent refusing integer results that would be too
+    large to compute in a reasonable time.
+
+    ### Params:
+    base
+     The base of the power
+    exponent
+     The exponent of the power
+
+    ### Returns:
+    out
+     base ** exponent
+    """
+    if (type(base) is int and type(exponent) is int and exponent > 0 and abs(base) > 1):
+        if (base.bit_length() * exponent > MAX_RESULT_BITS):
+            raise OverflowError("power result too large")
+
+    return base ** exponent
+
+def guarded_lshift(value, shift):
+    """
+    Left shift value by shift refusing results that would be too large.
+
+    ### Params:
+    value
+     The value to shift
+    shift
+     The number of bits to shift by
+
+    ### Returns:
+    out
+     value << shift
+    """
+    if (type(value) is int and type(shift) is int and value != 0):
+        if (value.bit_length() + shift > MAX_RESULT_BITS):
+            raise OverflowError("shift result too large")
+
+    return value << shift
+
+## The only builtins visible to an expression, the guard names cannot be
+#  typed by a user as names starting with __ are rejected.
+SAFE_BUILTINS = {"__pow_guard__": guarded_pow, "__lshift_guard__": guarded_lshift}
+
+class _Guarder(ast.NodeTransformer):
+    """
+    Replace the operators that can hang the process with guarded calls.
+    The new nodes take the location of the operator they replace so the
+    tree doesn't need fix_missing_locations.
+    """
+    GUARDS = {ast.Pow: "__pow_guard__", ast.LShift: "__lshift_guard__"}
+
+    def visit_BinOp(self, node: ast.BinOp):
+        self.generic_visit(node)
+
+        guard = self.GUARDS.get(type(node.op))
+        if (guard is None):
+            return node
+
+        function = ast.copy_location(ast.Name(id=guard, ctx=ast.Load()), node)
+        return ast.copy_location(ast.Call(func=function, args=[node.left, node.right], keywords=[]), node)
+
+class CompiledExpression():
+    """
+    A parsed, checked and compiled expression ready to be evaluated
+    many times.
+    """
+    __slots__ = ("source", "code", "names", "calls")
+
+    def __init__(self, source: str, code, names: frozenset, calls: frozenset = frozenset()):
+        """
+        Create a compiled expression
+
+        ### Params:
+        source : str
+         The python source the expression was compiled from
+        code
+         The compiled code object
+        names : frozenset
+         The names the expression reads from the namespace
+        calls : frozenset = frozenset()
+         The names the expression calls as functions
+        """
+        self.source = source
+        self.code = code
+        self.names = names
+        self.calls = calls
+
+def check_tree(tree: ast.AST) -> frozenset:
+    """
+    Check an expression tree against the whitelist of allowed syntax.
+
+    ### Params:
+    tree : ast.AST
+     The parsed expression
+
+    ### Returns:
+    names : frozenset
+     The names the expression reads
+    """
+    return scan_tree(tree)[0]
+
+def scan_tree(tree: ast.AST) -> tuple:
+    """
+    Check an expression tree against the whitelist of allowed syntax and
+    find what compiling it needs in the same pass.
+
+    ### Params:
+    tree : ast.AST
+     The parsed expression
+
+    ### Returns:
+    (names, calls, guarded)
+     The names the expression reads, the names it calls and True if it
+     has operators that need guarding
+    """
+    names = set()
+    calls = set()
+    guarded = False
+
+    for node in ast.walk(tree):
+        if (not isinstance(node, ALLOWED_NODES)):
+            raise ExpressionError(type(node).__name__ + " is not allowed in an equation")
+
+        if (isinstance(node, ast.Name)):
+            if (node.id.startswith("__")):
+                raise ExpressionError("name '" + node.id + "' is not allowed in an equation")
+            names.add(node.id)
+
+        elif (isinstance(node, ast.Constant) and type(node.value) not in ALLOWED_CONSTANTS):
+            raise ExpressionError(repr(node.value) + " is not allowed in an equation")
+
+        elif (isinstance(node, ast.Call)):
+            if (node.keywords or not isinstance(node.func, ast.Name)):
+                raise ExpressionError("only simple function calls are allowed in an equation")
+            calls.add(node.func.id)
+
+        elif (isinstance(node, ast.BinOp) and type(node.op) in _Guarder.GUARDS):
+            guarded = True
+
+    return (frozenset(names), frozenset(calls), guarded)
+
+def compile_expression(source: str) -> CompiledExpression:
+    """
+    Parse, check and compile a python expression.
+
+    ### Params:
+    source : str
+     The python expression source
+
+    ### Returns:
+    out : CompiledExpression
+     The compiled expression
+    """
+    tree = ast.parse(source.strip(), "<equation>", "eval")
+    names, _, guarded = scan_tree(tree)
+
+    if (guarded):
+        tree = _Guarder().visit(tree)
+
+    code = compile(tree, "<equation>", "eval")
+
+    return CompiledExpression(source, code, names)
+
+def compile_function(name: str, parameters: list, body_source: str) -> CompiledExpression:
+    """
+    Parse, check and compile a function body into an expression that
+    evaluates to a native python function taking the parameters given.
+    The parameters are real python arguments so they never collide with
+    other names.
+
+    ### Params:
+    name : str
+     The name of the function
+    parameters : list
+     The parameter names in order
+    body_source : str
+     The python expression source of the function body
+
+    ### Returns:
+    out : CompiledExpression
+     The compiled expression, its names are the free names of the body
+    """
+    for parameter in parameters:
+        if (not parameter.isidentifier() or parameter.startswith("__")):
+            raise ExpressionError("'" + parameter + "' is not a valid parameter name")
+    if (len(set(parameters)) != len(parameters)):
+        raise ExpressionError("duplicate parameter in '" + name + "'")
+
+    body = ast.parse(body_source.strip(), "<equation>", "eval")
+    names, calls, guarded = scan_tree(body)
+    names = names.difference(parameters)
+
+    if (guarded):
+        body = _Guarder().visit(body)
+
+    # The new nodes take the body's location rather than running fix_missing_locations
+    arguments = ast.arguments(posonlyargs=[], args=[ast.copy_location(ast.arg(arg=parameter), body.body)
+                                                    for parameter in parameters],
+                              kwonlyargs=[], kw_defaults=[], defaults=[])
+    tree = ast.Expression(body=ast.copy_location(ast.Lambda(args=arguments, body=body.body), body.body))
+    code = compile(tree, "<" + name + ">", "eval")
+
+    return CompiledExpression(body_source, code, names, calls.intersection(names))
+
+def make_function(name: str, expression: CompiledExpression, namespace: dict):
+    """
+    Create the native function from a compiled function expression. The
+    function looks up its free names in the namespace when it is called.
+
+    ### Params:
+    name : str
+     The name of the function
+    expression : CompiledExpression
+     The expression created by compile_function
+    namespace : dict
+     The dictionary of functions and variables available
+
+    ### Returns:
+    function
+     The native python function
+    """
+    function = evaluate(expression, namespace)
+    function.__name__ = name
+    function.__qualname__ = name
+
+    return function
+
+def evaluate(expression: CompiledExpression, namespace: dict):
+    """
+    Evaluate a compiled expression in the namespace given. The namespace
+    is the only thing the expression can see and as the engine allows no
+    assignment syntax it can't be modified.
+
+    ### Params:
+    expression : CompiledExpression
+     The compiled expression
+    namespace : dict
+     The dictionary of functions and variables available
+
+    ### Returns:
+    result
+     The result of the expression
+    """
+    if (namespace.get("__builtins__") is not SAFE_BUILTINS):
+        namespace["__builtins__"] = SAFE_BUILTINS
+
+    if (INTERRUPTER.thread_id is not None and INTERRUPTER.thread_id == threading.get_ident()):
+        return INTERRUPTER.run(expression.code, namespace)
+
+    return eval(expression.code, namespace)
@@ -0,0 +1,214 @@
+## @file formats.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-12
+#  @brief The output formats used by the exporter and the batch runner
+#
+#  Each format turns the history into text one equation at a time so
+#  that output can be streamed rather than built up in memory.
+
+import datetime
+import json
+import math
+import numbers
+
+from equation_eval import format_result
+from latex import escape_text, result_to_latex
+
+## Integers larger than this are written as text, python limits int to str conversion
+MAX_JSON_INT_BITS = 10000
+
+class TxtFormat():
+    """
+    The plain text format
+    """
+    extension = ".txt"
+
+    def header(self, title: str, comment: str) -> str:
+        """
+        Get the text written before the equations
+
+        ### Params:
+        title
+         The title to write at the beginning of the file
+        comment
+         The comment to add after the title
+        """
+        text = ""
+        if (len(title) != 0):
+            text += "Title: " + title + "\n\n"
+        if (len(comment) != 0):
+            text += "Comment:\n" + comment + "\n\n"
+
+        return text
+
+    def equation(self, equation) -> str:
+        """
+        Get the text for a single equation
+
+        ### Params:
+        equation : Equation
+         The equation to format
+        """
+        if (equation.type == "comment"):
+            return equation.equation_str[1:].strip() + "\n"
+        elif (equation.type == "equation"):
+            return equation.equation_str + "\n" + "= " + format_result(equation.result) + "\n"
+
+        return ""
+
+    def footer(self) -> str:
+        """
+        Get the text written after the equations
+        """
+        return "\n-- Printing Calc History --" + "\n" + "Export Time: " + str(datetime.datetime.now())[:-7]
+
+class MdFormat():
+    """
+    The markdown format
+    """
+    extension = ".md"
+
+    def header(self, title: str, comment: str) -> str:
+        """
+        Get the text written before the equations
+
+        ### Params:
+        title
+         The title to write at the beginning of the file
+        comment
+         The comment to add after the title
+        """
+        text = ""
+        if (len(title) != 0):
+            text += "# " + title + "\n\n"
+        if (len(comment) != 0):
+            text += comment.replace("\n", "\n\n") + "\n\n"
+
+        return text + "### Content: \n\n"
+
+    def equation(self, equation) -> str:
+        """
+        Get the text for a single equation
+
+        ### Params:
+        equation : Equation
+         The equation to format
+        """
+        if (equation.type == "comment"):
+            return equation.equation_str[1:].strip() + "\n\n"
+        elif (equation.type == "equation"):
+            return "$$\n" + equation.latex() + "\n" + "= " + result_to_latex(equation.result) + "\n" + "$$\n\n"
+
+        return ""
+
+    def footer(self) -> str:
+        """
+        Get the text written after the equations
+        """
+        return "---\n" + "\n ### Printing Calc History" + "\n\n" + "**Export Time:** " + str(datetime.datetime.now())[:-7]
+
+class LatexFormat():
+    """
+    The LaTeX document format, assignments are included so the functions
+    used are defined in the document.
+    """
+    extension = ".tex"
+
+    def header(self, title: str, comment: str) -> str:
+        """
+        Get the text written before the equations
+
+        ### Params:
+        title
+         The title to write at the beginning of the file
+        comment
+         The comment to add after the title
+        """
+        text = "\\documentclass{article}\n\\usepackage{amsmath}\n\n\\begin{document}\n\n"
+        if (len(title) != 0):
+            text += "\\section*{" + escape_text(title) + "}\n\n"
+        if (len(comment) != 0):
+            text += escape_text(comment).replace("\n", "\n\n") + "\n\n"
+
+        return text
+
+    def equation(self, equation) -> str:
+        """
+        Get the text for a single equation
+
+        ### Params:
+        equation : Equation
+         The equation to format
+        """
+        if (equation.type == "comment"):
+            return escape_text(equation.equation_str[1:].strip()) + "\n\n"
+        elif (equation.type == "assignment"):
+            return "\\[\n" + equation.latex() + "\n\\]\n\n"
+        elif (equation.type == "equation"):
+            return "\\[\n" + equation.latex() + " = " + result_to_latex(equation.result) + "\n\\]\n\n"
+
+        return ""
+
+    def footer(self) -> str:
+        """
+        Get the text written after the equations
+        """
+        return ("\\noindent\\rule{\\textwidth}{0.4pt}\n\n" + "\\textbf{Printing Calc History}\n\n" +
+                "Export Time: " + str(datetime.datetime.now())[:-7] + "\n\n\\end{document}\n")
+
+class JsonFormat():
+    """
+    The JSON format, a single object with every equation (including
+    assignments) in a list.
+    """
+    extension = ".json"
+
+    def __init__(self):
+        self.first = True
+
+    def header(self, title: str, comment: str) -> str:
+        """
+        Get the text written before the equations
+
+        ### Params:
+        title
+         The title to write at the beginning of the file
+        comment
+         The comment to add after the title
+        """
+        self.first = True
+        return '{"title": ' + json.dumps(title) + ', "comment": ' + json.dumps(comment) + ', "equations": ['
+
+    def equation(self, equation) -> str:
+        """
+        Get the text for a single equation
+
+        ### Params:
+        equation : Equation
+         The equation to format
+        """
+        result = equation.result
+        if (result is None or isinstance(result, bool)):
+            pass
+        elif (isinstance(result, numbers.Integral) and int(result).bit_length() <= MAX_JSON_INT_BITS):
+            result = int(result)
+        elif (isinstance(result, numbers.Real) and not isinstance(result, numbers.Integral)
+                and math.isfinite(result)):
+            result = float(result)
+        else: # Including inf and nan which JSON can't hold as numbers
+            result = format_result(result)
+
+        text = "" if self.first else ","
+        self.first = False
+
+        return text + "\n" + json.dumps({"equation": equation.equation_str, "type": equation.type,
+                                         "result": result}, allow_nan=False)
+
+    def footer(self) -> str:
+        """
+        Get the text written after the equations
+        """
+        return "\n]}\n"
+
+## The available formats keyed by name
+FORMATS = {"txt": TxtFormat, "md": MdFormat, "tex": LatexFormat, "json": JsonFormat}
@@ -6,20 +6,24 @@
 import tkinter as tk
 from tkinter import ttk
 
-from configuration import Config, ConfigDict
-
-from utils import rgb_to_tk
-
 from scrollable_frame import ScrollableFrame
 from equation import Equation 
-from equation_eval import default_assignments
+from equation_view import EquationView
+from theme import Theme
+from worksheet import Worksheet
+from evaluator import Evaluator
 
+## The milliseconds between checks for finished evaluations
+POLL_INTERVAL = 20
 
 class History(ScrollableFrame):
     """
-    This class displays the equations in a scrollable format.
+    This class displays the equations of a worksheet in a scrollable format.
+    Only the rows in view are drawn using a small pool of EquationView
+    widgets that are reused as the history is scrolled.
     """
-    def __init__(self, master: tk.Tk = None, theme_config: ConfigDict = None):
+    def __init__(self, master: tk.Tk = None, theme_config: Theme = None, worksheet: Worksheet = None,
+                 evaluator: Evaluator = None):
         """
         The constructor for the History class
 
@@ -27,14 +31,31 @@ class History(ScrollableFrame):
         master : tk.Tk
          The master frame for the history window to be placed inside of.
         theme_config
-         The theme configuration
+         The compiled theme
+        worksheet = None
+         The worksheet to display, a new empty one is created if None
+        evaluator = None
+         The evaluator used to change the worksheet off the GUI thread,
+         changes are made straight away if None
         
         ### Variables:
-        inner : tk.Frame
-         The inner frame to place things in
+        worksheet : Worksheet
+         The equations and assignments being displayed
+
+        pool : list
+         The EquationView widgets used to draw the visible rows
+
+        row_height : int
+         The height of every row in pixels, measured from the first row
+
+        selected : set
+         The equations selected with control click for bulk delete
+
+        pending : list
+         The equations waiting to be evaluated and added, drawn after the worksheet
 
-        equations : list 
-         A list of Equation objects that are currently in displayed
+        count : int
+         The number of worksheet rows when it was last drawn
          
         """
         # Setup the scrollable frame
@@ -42,46 +63,476 @@ class History(ScrollableFrame):
 
         self.theme = theme_config
 
-        self.inner.config(background=rgb_to_tk(self.theme.colours.background))
-        self.canvas.config(background=rgb_to_tk(self.theme.colours.background))
+        self.canvas.config(background=self.theme.colours.background)
+        self.theme.observers.append(self.theme_changed)
 
-        # Allow the frame to resize
-        self.inner.rowconfigure(0, weight=1)
-        self.inner.columnconfigure(0, weight=1)
+        # Rows are drawn straight onto the canvas so the inner frame isn't needed
+        self.canvas.delete(self.inner_id)
+        self.inner.unbind("<Configure>")
+        self.scrollbar.config(command=self.yview)
+        self.canvas.bind("<Configure>", self.__resize, add="+")
+        self.__bind_wheel(self.canvas)
 
-        # Create the assignments dictionary to store varaibles and functions
-        self.assignments = dict()
-        default_assignments(self.assignments)
+        self.pool : list[EquationView] = list()
+        self.row_height = None
+        self.selected : set[Equation] = set()
+        self.pending : list[Equation] = list()
+        self.count = 0
+        self.evaluator = evaluator
 
-        # The list of Equation objects displayed in the frame  
-        self.equations : list[Equation] = list()
+        self.worksheet = worksheet if worksheet is not None else Worksheet()
 
-        # Create some test equations
-        self.equations.append(Equation("# Question 1:", self.assignments, theme_config=self.theme))
-        self.equations.append(Equation("1+1", self.assignments, theme_config=self.theme))
-        self.equations.append(Equation("5*2", self.assignments, theme_config=self.theme))
-        self.equations.append(Equation("3+3**2+4", self.assignments, theme_config=self.theme))
-        self.equations.append(Equation("f(x):=2+x", self.assignments, theme_config=self.theme))
-        self.equations.append(Equation("y:=10", self.assignments, theme_config=self.theme))
+        self.render()
 
-        for i in range(len(self.equations)):
-            self.equations[i].create_equation(self.inner, delete_function=self.remove_equation)
-            self.equations[i].frm_equation.grid(row=i, column=0, sticky="ew")
-        
+        if (self.evaluator is not None):
+            self.after(POLL_INTERVAL, self.__poll)
+
+    @property
+    def equations(self) -> Worksheet:
+        """ The Equation objects in the history, supports len, indexing and iteration """
+        return self.worksheet
+
+    @property
+    def assignments(self) -> dict:
+        """ The dictionary of functions and variables available """
+        return self.worksheet.assignments
+
+    def __bind_wheel(self, widget: tk.Widget):
+        """
+        Scroll the history with the mouse wheel when over the widget
+
+        ### Params:
+        widget : tk.Widget
+         The widget to bind
+        """
+        widget.bind("<MouseWheel>", lambda event: self.yview("scroll", -1 if event.delta > 0 else 1, "units"))
+        widget.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        widget.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+
+    def __create_row(self, equation: Equation) -> EquationView:
+        """
+        Create a new pooled GUI object placed on the canvas.
+
+        ### Params:
+        equation : Equation
+         The equation to display first
+
+        ### Returns:
+        row : EquationView
+         The new row
+        """
+        row = EquationView(self.canvas, equation, self.theme, delete_function=self.remove_equation,
+                           edit_function=self.edit_equation, select_function=self.toggle_selection)
+        row.window_id = self.canvas.create_window(0, 0, anchor="nw", window=row, state="hidden",
+                                                  width=self.canvas.winfo_width())
+        row.index = None
+
+        for widget in [row, row.lbl_equation, row.lbl_result]:
+            self.__bind_wheel(widget)
+
+        if (self.row_height is None):
+            row.update_idletasks()
+            self.row_height = max(row.winfo_reqheight(), 1)
+            self.canvas.config(yscrollincrement=self.row_height)
+
+        self.pool.append(row)
+
+        return row
+
+    def __equation_at(self, index: int, count: int) -> Equation:
+        """
+        Get the equation drawn at a row
+
+        ### Params:
+        index : int
+         The row
+        count : int
+         The number of worksheet rows, pending equations come after these
+
+        ### Returns:
+        equation : Equation
+         The equation for the row
+        """
+        if (index >= count):
+            return self.pending[index - count]
+
+        return self.worksheet[index]
+
+    def render(self, refresh: bool = False):
+        """
+        Draw the rows in the visible part of the history reusing the pooled
+        rows. Rows still showing the same equation are left alone. While the
+        evaluator is changing the worksheet only the pending rows are drawn.
+
+        ### Params:
+        refresh : bool = False
+         Redraw the text of every visible row even if its equation hasn't changed
+        """
+        busy = not self.worksheet.lock.acquire(blocking=False)
+
+        try:
+            if (not busy):
+                self.count = len(self.worksheet)
+            count = self.count
+            total = count + len(self.pending)
+
+            if (self.row_height is None):
+                if (total == 0 or (busy and count != 0)):
+                    return
+                self.__create_row(self.__equation_at(0, count))
+
+            width = self.canvas.winfo_width()
+            height = max(self.canvas.winfo_height(), self.row_height)
+            self.canvas.config(scrollregion=(0, 0, width, total * self.row_height))
+
+            top = max(int(self.canvas.canvasy(0)), 0)
+            first = min(top // self.row_height, total)
+            last = min((top + height) // self.row_height + 1, total)
+
+            while (len(self.pool) < last - first):
+                index = first + len(self.pool)
+                if (busy and index < count):
+                    if (len(self.pending) == 0):
+                        break
+                    index = count # Any equation will do, the row is set below
+
+                self.__create_row(self.__equation_at(index, count))
+
+            for i, row in enumerate(self.pool):
+                index = first + i
+
+                if (index < last and not (busy and index < count)):
+                    equation = self.__equation_at(index, count)
+                    if (row.equation is not equation):
+                        row.set_equation(equation)
+                    elif (refresh):
+                        row.refresh()
+                    row.set_selected(equation in self.selected)
+
+                    # Only move rows whose position has changed
+                    if (row.index != index):
+                        if (row.index is None):
+                            self.canvas.itemconfigure(row.window_id, state="normal")
+                        self.canvas.coords(row.window_id, 0, index * self.row_height)
+                        row.index = index
+
+                elif (index < last and row.index == index):
+                    continue # The worksheet is busy so the row is left as it was
+
+                elif (row.index is not None):
+                    self.canvas.itemconfigure(row.window_id, state="hidden")
+                    row.index = None
+
+        finally:
+            if (not busy):
+                self.worksheet.lock.release()
+
+    def theme_changed(self, theme: Theme):
+        """
+        Restyle the history after the theme has changed, the rows follow
+        the shared styles so only the canvas and row height are updated.
+
+        ### Params:
+        theme : Theme
+         The changed theme
+        """
+        self.canvas.config(background=theme.colours.background)
+        self.font_changed()
+
+    def font_changed(self):
+        """
+        Measure the row height again after the theme font has changed
+        and redraw every visible row in its new position.
+        """
+        if (len(self.pool) == 0):
+            return
+
+        self.pool[0].update_idletasks()
+        self.row_height = max(self.pool[0].winfo_reqheight(), 1)
+        self.canvas.config(yscrollincrement=self.row_height)
+
+        for row in self.pool:
+            if (row.index is not None):
+                self.canvas.coords(row.window_id, 0, row.index * self.row_height)
+
+        self.render()
+
+    def __resize(self, event: tk.Event = None):
+        """
+        Stretch the rows to the canvas width and draw any newly visible rows
+
+        ### Params:
+        event : tk.Event
+         The event passed by tk
+        """
+        for row in self.pool:
+            self.canvas.itemconfigure(row.window_id, width=self.canvas.winfo_width())
+
+        self.render()
+
+    def yview(self, *args):
+        """
+        Scroll the canvas and draw the rows now in view, used by the
+        scrollbar and mouse wheel.
+
+        ### Params:
+        args
+         The arguments for tk.Canvas.yview
+        """
+        self.canvas.yview(*args)
+        self.render()
+
+    def scroll(self, position: str):
+        """
+        Scroll the canvas to a given point
+
+        ### Params:
+        position: str
+         The position to scroll to accepted: "bottom", "top", fraction of the height where 1 is the bottom
+        """
+        super().scroll(position)
+        self.render()
+
+    def test_update(self):
+        """
+        Force an update to the history
+        """
+        self.render(refresh=True)
+
+    def append(self, equation: Equation):
+        """
+        Add an evaluated equation to the end of the history.
+
+        ### Params:
+        equation : Equation
+         The equation to add
+        """
+        self.worksheet.append(equation)
+        self.render()
+
+    def run(self, function: callable, *args):
+        """
+        Change the worksheet by calling function on the evaluator, or
+        straight away if there isn't one, then redraw the history.
+
+        ### Params:
+        function : callable
+         The function that changes the worksheet
+        args
+         The arguments to call it with
+        """
+        if (self.evaluator is None):
+            function(*args)
+            self.render(refresh=True)
+        else:
+            self.evaluator.submit(function, *args, done_function=self.__finished)
+
+    def __poll(self):
+        """
+        Hand back the jobs the evaluator has finished, called every POLL_INTERVAL
+        """
+        self.after(POLL_INTERVAL, self.__poll)
+        self.evaluator.poll()
+
+    def __finished(self, job):
+        """
+        Redraw the history once a job has finished, called by the evaluator
+
+        ### Params:
+        job : Job
+         The finished job
+        """
+        self.render(refresh=True)
+
+        if (job.error is not None):
+            self.report_error(job.error)
+
+    def report_error(self, error: Exception):
+        """
+        Tell the user a change to the worksheet failed, raising it here
+        would only reach tk's callback handler
+
+        ### Params:
+        error : Exception
+         The error raised by the job
+        """
+        from tkinter import messagebox # Only needed once something has gone wrong
+
+        messagebox.showerror(title="Calculation Failed", parent=self, message="Calculation Failed:\n" + str(error))
+
+    def __added(self, job):
+        """
+        Move the equations added by a job out of the pending list, called
+        by the evaluator.
+
+        ### Params:
+        job : Job
+         The finished job
+        """
+        added = job.args[0]
+        del self.pending[:len(added) if isinstance(added, list) else 1] # Jobs finish in order
+
+        self.__finished(job)
+
+    def __add_pending(self, equations: list):
+        """
+        Evaluate and add several pending equations, run on the evaluator.
+
+        ### Params:
+        equations : list
+         The pending equations
+        """
+        with self.worksheet.lock:
+            for equation in equations:
+                self.worksheet.add_pending(equation)
+
+    def add(self, equation_str: str) -> Equation:
+        """
+        Evaluate an equation string and add it to the end of the history.
+        With an evaluator the equation is shown as pending until it has
+        been evaluated.
+
+        ### Params:
+        equation_str : str
+         The equation to add
+
+        ### Returns:
+        equation : Equation
+         The new equation
+        """
+        if (self.evaluator is None):
+            equation = self.worksheet.add(equation_str)
+            self.render()
+            return equation
+
+        equation = Equation(equation_str, evaluate=False)
+        self.pending.append(equation)
+        self.render()
+
+        self.evaluator.submit(self.worksheet.add_pending, equation, done_function=self.__added)
+
+        return equation
+
+    def extend(self, lines) -> list:
+        """
+        Evaluate several equation strings and add them to the end of the
+        history, drawing the history once at the end.
+
+        ### Params:
+        lines
+         The equation strings to add
+
+        ### Returns:
+        equations : list
+         The new equations
+        """
+        if (self.evaluator is None):
+            equations = self.worksheet.extend(lines)
+            self.render()
+            return equations
+
+        equations = [Equation(line.strip(), evaluate=False) for line in lines if len(line.strip()) != 0]
+        self.pending.extend(equations)
+        self.render()
+
+        self.evaluator.submit(self.__add_pending, equations, done_function=self.__added)
+
+        return equations
 
     def remove_equation(self, equation: Equation):
         """
-        Remove an equation from the history frame called by the delete
-        button in the Equation widget.
+        Remove an equation from the history called by the delete
+        button in the EquationView widget. Equations that used a removed
+        assignment are recalculated. Pending equations can't be removed.
 
         ### Params:
         equation : Equation
         The equation to remove
         """
-        index = self.equations.index(equation)
-        self.equations.remove(equation)
+        if (equation.pending):
+            return
+
+        equation.pending = True
+        self.selected.discard(equation)
+        self.run(self.worksheet.remove, equation)
+
+    def remove_equations(self, equations):
+        """
+        Remove several equations at once, recalculating and redrawing the
+        history a single time.
+
+        ### Params:
+        equations
+         The equations to remove
+        """
+        equations = [equation for equation in equations if not equation.pending]
+        for equation in equations:
+            equation.pending = True
+
+        self.selected.difference_update(equations)
+        self.run(self.worksheet.remove_many, equations)
+
+    def toggle_selection(self, equation: Equation):
+        """
+        Select or deselect an equation, called by control clicking the
+        EquationView widget.
+
+        ### Params:
+        equation : Equation
+         The equation to select or deselect
+        """
+        if (equation in self.selected):
+            self.selected.remove(equation)
+        else:
+            self.selected.add(equation)
+
+        self.render()
+
+    def delete_selected(self):
+        """
+        Remove every selected equation.
+        """
+        self.remove_equations(list(self.selected))
+
+    def clear(self):
+        """
+        Remove every equation from the history.
+        """
+        self.selected.clear()
+        self.run(self.worksheet.clear)
+
+    def update_equation(self, equation: Equation, equation_str: str):
+        """
+        Change the text of an equation and recalculate it along with the
+        equations that depend on it.
+
+        ### Params:
+        equation : Equation
+         The equation to change, pending equations can't be changed
+        equation_str : str
+         The new equation string
+        """
+        if (equation.pending):
+            return
+
+        equation.pending = True
+        self.render(refresh=True)
+
+        self.run(self.worksheet.update, equation, equation_str)
+
+    def edit_equation(self, equation: Equation):
+        """
+        Ask for a new equation string, called by double clicking the
+        EquationView widget.
+
+        ### Params:
+        equation : Equation
+         The equation to edit
+        """
+        from tkinter import simpledialog
 
-        # Re initialise the lower equations with the new index one higher
-        for i in range(index, len(self.equations)):
-            self.equations[i].frm_equation.grid(row=i, column=0, sticky="ew")
+        equation_str = simpledialog.askstring("Edit Equation", "Equation:", parent=self,
+                                              initialvalue=equation.equation_str)
 
+        if (equation_str is not None and len(equation_str) != 0):
+            self.update_equation(equation, equation_str)
@@ -0,0 +1,323 @@
+## @file latex.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-17
+#  @brief Convert equations into LaTeX for the LaTeX and markdown exports
+#  @details The equation is parsed with the same rules as the expression
+#  engine and the tree is written out as typeset maths, so a/b becomes a
+#  fraction and a**b a power. Equations that can't be parsed are written
+#  as text.
+
+import ast
+import re
+
+from equation_eval import normalise_equation, split_assignment, format_result
+from expression_engine import check_tree
+
+## The names written as a single LaTeX symbol
+SYMBOLS = {"pi": r"\pi", "inf": r"\infty"}
+
+## Greek letters LaTeX has a command for
+GREEK = {"alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa",
+         "lambda", "mu", "nu", "xi", "rho", "sigma", "tau", "upsilon", "phi", "chi", "psi", "omega",
+         "Gamma", "Delta", "Theta", "Lambda", "Xi", "Pi", "Sigma", "Upsilon", "Phi", "Psi", "Omega"}
+
+## The functions LaTeX has an operator for
+OPERATORS = {"sin", "cos", "tan", "exp", "log", "ln", "sinh", "cosh", "tanh", "arcsin", "arccos",
+             "arctan", "min", "max", "det", "gcd"}
+
+## The LaTeX for each binary operator that is written between its operands
+BINOPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: r"\cdot", ast.Mod: r"\bmod",
+          ast.BitXor: r"\oplus", ast.BitAnd: r"\mathbin{\&}", ast.BitOr: r"\mid",
+          ast.LShift: r"\ll", ast.RShift: r"\gg"}
+
+## The LaTeX for each comparison
+CMPOPS = {ast.Eq: "=", ast.NotEq: r"\neq", ast.Lt: "<", ast.LtE: r"\leq", ast.Gt: ">", ast.GtE: r"\geq"}
+
+## The binding strength of each node, higher binds tighter (python's order)
+PRECEDENCE = {ast.IfExp: 1, ast.Or: 2, ast.And: 3, ast.Not: 4, ast.Compare: 5,
+              ast.BitOr: 6, ast.BitXor: 7, ast.BitAnd: 8, ast.LShift: 9, ast.RShift: 9,
+              ast.Add: 10, ast.Sub: 10, ast.Mult: 11, ast.Div: 11, ast.FloorDiv: 11, ast.Mod: 11,
+              ast.UAdd: 12, ast.USub: 12, ast.Invert: 12, ast.Pow: 13}
+
+## The characters that have to be escaped in LaTeX text
+TEXT_ESCAPES = {"\\": r"\textbackslash{}", "{": r"\{", "}": r"\}", "$": r"\$", "&": r"\&",
+                "#": r"\#", "%": r"\%", "_": r"\_", "^": r"\^{}", "~": r"\~{}"}
+
+## A number written in scientific notation
+SCIENTIFIC = re.compile(r"(-?[0-9.]+)e([+-]?)0*([0-9]+)")
+
+def escape_text(text: str) -> str:
+    """
+    Escape text so LaTeX shows it as written
+
+    ### Params:
+    text
+     The text to escape
+
+    ### Returns:
+    out
+     The escaped text
+    """
+    return "".join(TEXT_ESCAPES.get(char, char) for char in text)
+
+def precedence(node: ast.AST) -> int:
+    """
+    Find how tightly a node binds
+
+    ### Params:
+    node
+     The node
+
+    ### Returns:
+    out
+     The precedence, atoms bind tightest
+    """
+    if (isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Div, ast.FloorDiv))):
+        return 100 # Fractions are already grouped
+    elif (isinstance(node, (ast.BinOp, ast.UnaryOp, ast.BoolOp))):
+        return PRECEDENCE[type(node.op)]
+
+    return PRECEDENCE.get(type(node), 100)
+
+def name_to_latex(name: str) -> str:
+    """
+    Convert a variable name into LaTeX, anything after the first
+    underscore is written as a subscript.
+
+    ### Params:
+    name
+     The variable name
+
+    ### Returns:
+    out
+     The LaTeX for the name
+    """
+    base, _, subscript = name.partition("_")
+
+    if (base in SYMBOLS):
+        base = SYMBOLS[base]
+    elif (base in GREEK):
+        base = "\\" + base
+    elif (len(base) > 1):
+        base = r"\mathrm{" + escape_text(base) + "}"
+
+    if (len(subscript) != 0):
+        return base + "_{" + name_to_latex(subscript) + "}"
+
+    return base
+
+def number_to_latex(text: str) -> str:
+    """
+    Convert a number written by python into LaTeX
+
+    ### Params:
+    text
+     The number as python would write it
+
+    ### Returns:
+    out
+     The LaTeX for the number
+    """
+    match = SCIENTIFIC.fullmatch(text)
+    if (match):
+        mantissa, sign, exponent = match.groups()
+        power = "10^{" + ("-" if sign == "-" else "") + exponent + "}"
+
+        return power if mantissa == "1" else mantissa + r" \times " + power
+
+    return escape_text(text)
+
+def imaginary_to_latex(value: float) -> str:
+    """
+    Convert the imaginary part of a complex number into LaTeX
+
+    ### Params:
+    value
+     The imaginary part
+
+    ### Returns:
+    out
+     The LaTeX for the imaginary number
+    """
+    if (value.is_integer()):
+        value = int(value) # Written as python would, 2j not 2.0j
+
+    return number_to_latex(format_result(value)) + "i"
+
+class LatexWriter(ast.NodeVisitor):
+    """
+    Writes a checked expression tree as LaTeX
+    """
+    def wrap(self, node: ast.AST, parent: int, right: bool = False) -> str:
+        """
+        Write a child node adding brackets if it binds looser than its parent
+
+        ### Params:
+        node
+         The child node
+        parent
+         The precedence of the parent
+        right = False
+         True if the child is on the right of a left associative operator
+        """
+        text = self.visit(node)
+        child = precedence(node)
+
+        if (child < parent or (right and child == parent)):
+            return r"\left(" + text + r"\right)"
+
+        return text
+
+    def visit_Expression(self, node: ast.Expression) -> str:
+        return self.visit(node.body)
+
+    def visit_Constant(self, node: ast.Constant) -> str:
+        if (isinstance(node.value, bool)):
+            return r"\mathrm{" + str(node.value) + "}"
+        elif (isinstance(node.value, complex)):
+            return imaginary_to_latex(node.value.imag)
+
+        return number_to_latex(format_result(node.value))
+
+    def visit_Name(self, node: ast.Name) -> str:
+        return name_to_latex(node.id)
+
+    def visit_BinOp(self, node: ast.BinOp) -> str:
+        op = type(node.op)
+        level = PRECEDENCE[op]
+
+        if (op == ast.Div):
+            return r"\frac{" + self.visit(node.left) + "}{" + self.visit(node.right) + "}"
+        elif (op == ast.FloorDiv):
+            return r"\left\lfloor \frac{" + self.visit(node.left) + "}{" + self.visit(node.right) + r"} \right\rfloor"
+        elif (op == ast.Pow):
+            # Powers are right associative and the exponent is raised so needs no brackets
+            if (isinstance(node.left, ast.BinOp)):
+                base = r"\left(" + self.visit(node.left) + r"\right)"
+            else:
+                base = self.wrap(node.left, level, right=True)
+
+            return "{" + base + "}^{" + self.visit(node.right) + "}"
+
+        return self.wrap(node.left, level) + " " + BINOPS[op] + " " + self.wrap(node.right, level, right=True)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> str:
+        level = PRECEDENCE[type(node.op)]
+        operand = self.wrap(node.operand, level)
+
+        if (isinstance(node.op, ast.USub)):
+            return "-" + operand
+        elif (isinstance(node.op, ast.UAdd)):
+            return "+" + operand
+        elif (isinstance(node.op, ast.Not)):
+            return r"\neg " + operand
+
+        return r"\sim " + operand
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> str:
+        level = PRECEDENCE[type(node.op)]
+        joiner = r" \land " if isinstance(node.op, ast.And) else r" \lor "
+
+        return joiner.join(self.wrap(value, level, right=True) for value in node.values)
+
+    def visit_Compare(self, node: ast.Compare) -> str:
+        level = PRECEDENCE[ast.Compare]
+        text = self.wrap(node.left, level, right=True)
+
+        for op, comparator in zip(node.ops, node.comparators):
+            text += " " + CMPOPS[type(op)] + " " + self.wrap(comparator, level, right=True)
+
+        return text
+
+    def visit_IfExp(self, node: ast.IfExp) -> str:
+        return (r"\begin{cases} " + self.visit(node.body) + r" & \text{if } " + self.visit(node.test) +
+                r" \\ " + self.visit(node.orelse) + r" & \text{otherwise} \end{cases}")
+
+    def visit_Call(self, node: ast.Call) -> str:
+        name = node.func.id
+        arguments = [self.visit(argument) for argument in node.args]
+
+        if (name == "sqrt" and len(arguments) == 1):
+            return r"\sqrt{" + arguments[0] + "}"
+        elif (name == "abs" and len(arguments) == 1):
+            return r"\left|" + arguments[0] + r"\right|"
+        elif (name in OPERATORS):
+            function = "\\" + name
+        elif (len(name) == 1):
+            function = name
+        else:
+            function = r"\operatorname{" + escape_text(name) + "}"
+
+        return function + r"\left(" + ", ".join(arguments) + r"\right)"
+
+def expression_to_latex(source: str) -> str:
+    """
+    Convert an expression in calculator syntax into LaTeX
+
+    ### Params:
+    source
+     The expression
+
+    ### Returns:
+    out
+     The LaTeX for the expression
+    """
+    tree = ast.parse(normalise_equation(source).strip(), mode="eval")
+    check_tree(tree)
+
+    return LatexWriter().visit(tree)
+
+def equation_to_latex(equation_str: str) -> str:
+    """
+    Convert an equation string into LaTeX maths. Assignments are written
+    with their signature, comments and equations that can't be parsed or
+    are nested too deeply to convert are written as text.
+
+    ### Params:
+    equation_str
+     The equation string
+
+    ### Returns:
+    out
+     The LaTeX for the equation
+    """
+    if (equation_str.startswith("#")):
+        return r"\text{" + escape_text(equation_str[1:].strip()) + "}"
+
+    try:
+        if (equation_str.find(":=") != -1):
+            name, parameters, assigne = split_assignment(equation_str)
+            signature = name_to_latex(name)
+
+            if (parameters is not None):
+                signature += r"\left(" + ", ".join(name_to_latex(parameter) for parameter in parameters) + r"\right)"
+
+            return signature + " := " + expression_to_latex(assigne)
+
+        return expression_to_latex(equation_str)
+
+    except (SyntaxError, ValueError, KeyError, AttributeError, RecursionError): # Very long expressions are too deep to visit
+        return r"\text{" + escape_text(equation_str) + "}"
+
+def result_to_latex(result) -> str:
+    """
+    Convert the result of an equation into LaTeX
+
+    ### Params:
+    result
+     The result of the equation
+
+    ### Returns:
+    out
+     The LaTeX for the result
+    """
+    text = format_result(result)
+
+    if (isinstance(result, complex)):
+        real = result.real if not result.real.is_integer() else int(result.real)
+        return (number_to_latex(format_result(real)) + (" - " if result.imag < 0 else " + ") +
+                imaginary_to_latex(abs(result.imag)))
+    elif (isinstance(result, (int, float)) and not isinstance(result, bool)):
+        return number_to_latex(text)
+
+    return r"\text{" + escape_text(text) + "}"
@@ -3,17 +3,27 @@
 #  @author Jack Duignan (JackpDuignan@gmail.com)
 #  @date 2024-05-28
 #  @brief The main file for the printing calculator project
+#  @details Only the history and the entry are built before the first
+#  frame is drawn, everything else is created or imported once the
+#  window is showing. The theme file is watched and applied again
+#  whenever it is saved. Check the import cost with:
+#  python3 -X importtime ./src/main.py 2> importtime.log
 
 import tkinter as tk
 from tkinter import ttk
 import os
 import sys
 
-from configuration import ConfigDict, Config
-from equation import Equation
+from configuration import FrozenConfigDict, Config
 from menu_bar import MenuBar
 from equation_entry import EquationEntry
 from history import History
+from evaluator import Evaluator
+from scheduler import Scheduler
+from theme import Theme
+
+## The milliseconds between checks for changes to the theme file
+THEME_POLL_INTERVAL = 1000
 
 def get_cwd() -> str:
     """
@@ -38,7 +48,7 @@ def get_cwd() -> str:
     else:
         return os.getcwd() + "\\" + argv_0
     
-def load_theme(theme_path: str) -> ConfigDict:
+def load_theme(theme_path: str) -> FrozenConfigDict:
     """
     Load the colour theme
     
@@ -48,9 +58,9 @@ def load_theme(theme_path: str) -> ConfigDict:
 
     ### Returns:
     theme_config
-     The theme config dict
+     The theme config, it can't be changed
     """
-    theme_config = Config.load_json(theme_path)
+    theme_config = Config.load_frozen_json(theme_path)
 
     return theme_config
 
@@ -71,19 +81,85 @@ class App(tk.Tk):
 
         self.__setup_window()
 
-        self.theme_config = load_theme(get_cwd()+"/theme.json")
+        self.theme_path = get_cwd()+"/theme.json"
+        self.theme_mtime = self.__theme_mtime()
+        self.theme_config = Theme(load_theme(self.theme_path), self)
+
+        # Equations are evaluated on a worker thread so the window never freezes
+        self.evaluator = Evaluator()
 
         # Create the history
-        self.history = History(self, theme_config=self.theme_config)
+        self.history = History(self, theme_config=self.theme_config, evaluator=self.evaluator)
         self.history.grid(row=0, column=0, sticky="nsew")
 
-        # Create the menu bar
-        self.menu_bar = MenuBar(self, [self.history], theme_config=self.theme_config)
+        # Independent equations that are slow to calculate are recalculated across all the cores
+        self.history.worksheet.scheduler = Scheduler()
 
         # Create the equation entry
-        self.equation_entry = EquationEntry(self, add_equation_function=self.add_equation, theme_config=self.theme_config)
+        self.equation_entry = EquationEntry(self, add_equation_function=self.add_equation,
+                                            add_equations_function=self.add_equations, theme_config=self.theme_config)
         self.equation_entry.grid(row=1, column=0, sticky="nsew")
 
+        # Zoom with the shared theme font
+        self.bind_all("<Control-equal>", lambda event: self.change_font_size(1))
+        self.bind_all("<Control-plus>", lambda event: self.change_font_size(1))
+        self.bind_all("<Control-minus>", lambda event: self.change_font_size(-1))
+
+        # Stop a long running evaluation
+        self.bind_all("<Escape>", lambda event: self.evaluator.cancel())
+
+        # The menu bar isn't needed for the first frame
+        self.menu_bar = None
+        self.after_idle(self.__create_menu_bar)
+
+        self.after(THEME_POLL_INTERVAL, self.__poll_theme)
+
+    def __create_menu_bar(self):
+        """
+        Create the menu bar, called once the window is showing
+        """
+        self.menu_bar = MenuBar(self, [self.history], theme_config=self.theme_config)
+
+    def __theme_mtime(self) -> int:
+        """
+        Get when the theme file was last changed
+
+        ### Returns:
+        mtime : int
+         The modified time in ns, None if the file can't be read
+        """
+        try:
+            return os.stat(self.theme_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def __poll_theme(self):
+        """
+        Apply the theme again if its file has changed, called every
+        THEME_POLL_INTERVAL ms. A file that can't be read or is invalid,
+        such as one half saved, is ignored until it changes again.
+        """
+        self.after(THEME_POLL_INTERVAL, self.__poll_theme)
+
+        mtime = self.__theme_mtime()
+        if (mtime is None or mtime == self.theme_mtime):
+            return
+
+        self.theme_mtime = mtime
+
+        try:
+            theme_config = load_theme(self.theme_path)
+        except (OSError, ValueError):
+            return
+
+        if (theme_config == self.theme_config.config):
+            return
+
+        try:
+            self.theme_config.apply(theme_config)
+        except (AttributeError, KeyError, TypeError, ValueError, tk.TclError) as error:
+            print(f"theme not applied: {error}", file=sys.stderr)
+
     def add_equation(self, equation_str):
         """
         Add a new equation to the history. Called by the equation entry.
@@ -92,13 +168,25 @@ class App(tk.Tk):
         equation_str
          The equation to add
         """
-        equation = Equation(equation_str, self.history.assignments, theme_config=self.theme_config)
+        # Evaluate and add the equation to the gui
+        self.history.add(equation_str)
+
+        self.update_idletasks()
 
-        # Add created equation to the gui
-        equation.create_equation(self.history.inner, delete_function=self.history.remove_equation)
-        equation.frm_equation.grid(row=len(self.history.equations), column=0, sticky="ew")
+        self.history.scroll("bottom")
 
-        self.history.equations.append(equation)
+        return True
+
+    def add_equations(self, equation_strs: list):
+        """
+        Add several equations to the history at once, the window is only
+        updated and scrolled once. Called by the equation entry on paste.
+
+        ### Params:
+        equation_strs
+         The equations to add in order
+        """
+        self.history.extend(equation_strs)
 
         self.update_idletasks()
 
@@ -106,6 +194,18 @@ class App(tk.Tk):
 
         return True
 
+    def change_font_size(self, step: int):
+        """
+        Grow or shrink the font of every widget at once through the shared
+        theme font.
+
+        ### Params:
+        step : int
+         The change in font size
+        """
+        self.theme_config.set_font_size(self.theme_config.font_size + step)
+        self.history.font_changed()
+
     def __setup_window(self):
         """
         Create the main application window
@@ -123,7 +223,12 @@ class App(tk.Tk):
         self.mainloop()
 
 
-myapp = App()
+if __name__ == "__main__":
+    if (getattr(sys, "frozen", False)): # The process pools need this in the stand alone application
+        import multiprocessing
+        multiprocessing.freeze_support()
+
+    myapp = App()
 
-# start the program
-myapp.start()
\ No newline at end of file
+    # start the program
+    myapp.start()
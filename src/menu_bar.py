@@ -2,20 +2,20 @@
 #  @author Jack Duignan (JackpDuignan@gmail.com)
 #  @date 2024-04-20
 #  @brief The file contains the menubar for the main calculator window
+#  @details The windows and file handling behind each option are only
+#  imported when the option is first used to keep start up fast.
 
 import tkinter as tk
-from copy import copy
 
-from configuration import ConfigDict
 from history import History
-from export import ExportWindow
+from theme import Theme
 
 class MenuBar(tk.Menu):
     """
     Menu bar class which contains the formatting and functionality 
     for the main menu
     """
-    def __init__(self, master: tk.Widget, histories : list[History], theme_config: ConfigDict = None) -> None:
+    def __init__(self, master: tk.Widget, histories : list[History], theme_config: Theme = None) -> None:
         """
         Initialise the class
 
@@ -25,11 +25,17 @@ class MenuBar(tk.Menu):
         histories : list
          A list of the current histories
         theme_config
-         The theme config
+         The compiled theme
 
         ### Variables:
         histories : list
          A list of history objects that are currently in use in the application
+
+        session : Session
+         The session file the history is being saved to, None until saved
+
+        sandboxed : tk.BooleanVar
+         True if equations are evaluated in a sandbox process
         """
         super().__init__(master)
         self.master = master
@@ -37,6 +43,8 @@ class MenuBar(tk.Menu):
         ## The histories that are currently in use in the application
         self.histories = histories
         self.theme = theme_config
+        self.session = None
+        self.sandboxed = tk.BooleanVar(self, value=False)
 
         self.filemenu = self.__create_filemenu()
 
@@ -51,14 +59,18 @@ class MenuBar(tk.Menu):
 
         filemenu.add_command(label="New Window")
         filemenu.add_command(label="Clear", command=self.__clear_history)
+        filemenu.add_command(label="Delete Selected", command=self.__delete_selected)
         filemenu.add_separator()
 
-        filemenu.add_command(label="Save")
-        filemenu.add_command(label="Save as")
+        filemenu.add_command(label="Open", command=self.__open)
+        filemenu.add_command(label="Save", command=self.__save)
+        filemenu.add_command(label="Save as", command=self.__save_as)
         filemenu.add_command(label="Export", command=self.__export)
+        filemenu.add_command(label="Performance", command=self.__performance)
         filemenu.add_separator()
         
-        filemenu.add_command(label="Preferences")
+        filemenu.add_checkbutton(label="Sandboxed Evaluation", variable=self.sandboxed, command=self.__toggle_sandbox)
+        filemenu.add_command(label="Preferences", command=self.__preferences)
         filemenu.add_separator()
         
         filemenu.add_command(label="Exit", command=self.master.quit)
@@ -77,8 +89,7 @@ class MenuBar(tk.Menu):
         # Find the active history and clear it 
         for history in self.histories:
             if (bool(history.grid_info())):
-                for equation in copy(history.equations):
-                    equation.delete_equation()
+                history.clear()
                 
         # These calls ensure that the scroll bar resets
         # be very careful it is finicky it works the same
@@ -87,6 +98,148 @@ class MenuBar(tk.Menu):
         history.scroll("top")
         self.master.after_idle(history.test_update) 
 
+    def __delete_selected(self, event : tk.Event = None):
+        """
+        Delete the selected equations called by the file->delete selected option
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        for history in self.histories:
+            if (bool(history.grid_info())):
+                history.delete_selected()
+
+    def __open(self, event : tk.Event = None):
+        """
+        Replace the history with a saved session called by the file->open option
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        from tkinter import filedialog
+        from session import SESSION_EXTENSION
+
+        path = filedialog.askopenfilename(parent=self.master, defaultextension=SESSION_EXTENSION,
+                                          filetypes=[("Printing Calc Session", "*" + SESSION_EXTENSION)])
+        if (not path):
+            return
+
+        # The worksheet is changed on the evaluator so these run in order after any waiting changes
+        history = self.histories[0]
+        history.run(self.__stop_session)
+        history.clear()
+        history.run(self.__start_session, path, history.worksheet, True)
+
+        history.scroll("top")
+        self.master.after_idle(history.test_update)
+
+    def __save(self, event : tk.Event = None):
+        """
+        Save the history called by the file->save option. Changes are
+        saved as they are made once a session file has been chosen so this
+        only compacts the file.
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        if (self.session is None):
+            self.__save_as()
+        else:
+            self.histories[0].run(self.session.compact)
+
+    def __save_as(self, event : tk.Event = None):
+        """
+        Save the history to a new session file called by the file->save as option
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        from tkinter import filedialog
+        from session import SESSION_EXTENSION
+
+        path = filedialog.asksaveasfilename(parent=self.master, defaultextension=SESSION_EXTENSION,
+                                            filetypes=[("Printing Calc Session", "*" + SESSION_EXTENSION)])
+        if (not path):
+            return
+
+        history = self.histories[0]
+        history.run(self.__start_session, path, history.worksheet)
+
+    def __start_session(self, path: str, worksheet, load: bool = False):
+        """
+        Stop saving to the current session file and start saving to a new
+        one, run on the history's evaluator.
+
+        ### Params:
+        path : str
+         The session file, None to only stop saving
+        worksheet : Worksheet
+         The worksheet to save
+        load : bool = False
+         Load the session file into the worksheet rather than writing it
+        """
+        from session import Session
+
+        previous = self.session
+        self.__stop_session()
+        self.session = None
+
+        if (path is None):
+            return
+        elif (load):
+            self.session = Session.load(path, worksheet)
+        else:
+            self.session = Session(path, worksheet)
+
+        # The rows have been cleared or copied to the new file so the old one isn't read again
+        if (previous is not None):
+            previous.release()
+
+    def __stop_session(self):
+        """
+        Stop saving to the current session file, its rows not yet read
+        are still read from it until a new session is started. Run on the
+        history's evaluator.
+        """
+        if (self.session is not None):
+            self.session.close()
+
+    def __toggle_sandbox(self, event : tk.Event = None):
+        """
+        Start or stop evaluating in a sandbox process called by the
+        file->sandboxed evaluation option
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        for history in self.histories:
+            history.run(self.__set_sandbox, history.worksheet, self.sandboxed.get())
+
+    def __set_sandbox(self, worksheet, enabled: bool):
+        """
+        Give a worksheet a sandbox or take it away, run on the history's
+        evaluator.
+
+        ### Params:
+        worksheet : Worksheet
+         The worksheet to change
+        enabled : bool
+         True to evaluate in a sandbox
+        """
+        from sandbox import Sandbox
+
+        with worksheet.lock:
+            if (enabled and worksheet.sandbox is None):
+                worksheet.sandbox = Sandbox()
+            elif (not enabled and worksheet.sandbox is not None):
+                worksheet.sandbox.close()
+                worksheet.sandbox = None
+
     def __export(self, event : tk.Event = None):
         """
         Export the current format using the selected format
@@ -95,4 +248,49 @@ class MenuBar(tk.Menu):
         event : tk.Event
          The event object
         """
+        from export import ExportWindow
+
         Export = ExportWindow(self.histories[0], self.theme)
+
+    def __preferences(self, event : tk.Event = None):
+        """
+        Set the time and memory limits on evaluations called by the
+        file->preferences option
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        from tkinter import simpledialog
+
+        history = self.histories[0]
+        if (history.evaluator is None):
+            return
+
+        time_limit = simpledialog.askfloat("Preferences", "Time limit for each evaluation (seconds):", parent=self.master,
+                                           initialvalue=history.evaluator.time_limit, minvalue=0.1)
+        if (time_limit is None):
+            return
+
+        memory_limit = simpledialog.askinteger("Preferences", "Largest array (MB):", parent=self.master,
+                                               initialvalue=history.worksheet.assignments.max_array_bytes >> 20,
+                                               minvalue=1)
+        if (memory_limit is None):
+            return
+
+        history.evaluator.time_limit = time_limit
+
+        if ((memory_limit << 20) != history.worksheet.assignments.max_array_bytes):
+            history.run(history.worksheet.set_memory_limit, memory_limit << 20)
+
+    def __performance(self, event : tk.Event = None):
+        """
+        Show the performance window called by the file->performance option
+
+        ### Params:
+        event : tk.Event
+         The event object
+        """
+        from performance import PerformanceWindow
+
+        PerformanceWindow(self.histories[0], self.theme)
@@ -0,0 +1,305 @@
+## @file metrics.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Record how long equations and user functions take to run
+#  @details Nothing is measured until enable() is called. While disabled
+#  equations only check ENABLED and user functions are created without
+#  the timing wrapper so the cost is a single flag test per equation.
+#  The records can be saved as JSON or in the pstats format read by
+#  python -m pstats and profile viewers such as snakeviz.
+#  This file has no GUI code.
+
+import json
+import marshal
+import threading
+import time
+
+## True while metrics are being recorded, read this through the module
+ENABLED = False
+
+class EquationMetrics():
+    """
+    The timings of one equation in the worksheet
+    """
+    __slots__ = ("key", "equation_str", "calls", "total", "last")
+
+    def __init__(self, key: int, equation_str: str):
+        """
+        Create the record of an equation
+
+        ### Params:
+        key : int
+         The equation's key, None if it isn't in a worksheet
+        equation_str : str
+         The equation string when it was last evaluated
+
+        ### Variables:
+        calls : int
+         The number of times the equation was evaluated
+
+        total : float
+         The seconds spent evaluating it in total
+
+        last : float
+         The seconds taken by the last evaluation
+        """
+        self.key = key
+        self.equation_str = equation_str
+        self.calls = 0
+        self.total = 0.0
+        self.last = 0.0
+
+    def to_dict(self) -> dict:
+        return {"key": self.key, "equation": self.equation_str, "calls": self.calls,
+                "total": self.total, "last": self.last}
+
+class FunctionMetrics():
+    """
+    The timings of one user function
+    """
+    __slots__ = ("name", "calls", "top_calls", "total", "cache")
+
+    def __init__(self, name: str):
+        """
+        Create the record of a user function
+
+        ### Params:
+        name : str
+         The name the function is assigned to
+
+        ### Variables:
+        calls : int
+         The number of calls that ran the function including recursive
+         ones, calls answered by the memo cache are counted in hits
+
+        top_calls : int
+         The number of calls not made from inside the function itself
+
+        total : float
+         The seconds spent in the top calls, recursive calls are included
+         in their caller's time
+
+        cache : LRUCache
+         The memo cache of the latest definition, None if not memoised
+        """
+        self.name = name
+        self.calls = 0
+        self.top_calls = 0
+        self.total = 0.0
+        self.cache = None
+
+    @property
+    def hits(self) -> int:
+        """ The number of calls answered by the memo cache """
+        return self.cache.hits if self.cache is not None else 0
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "calls": self.calls, "top_calls": self.top_calls,
+                "total": self.total, "cache_hits": self.hits}
+
+class Registry():
+    """
+    The records of every equation and user function measured
+    """
+    def __init__(self):
+        """
+        Create an empty registry
+
+        ### Variables:
+        equations : dict
+         The EquationMetrics keyed by equation key (or string if it has none)
+
+        functions : dict
+         The FunctionMetrics keyed by function name
+        """
+        self.lock = threading.Lock()
+        self.equations : dict[object, EquationMetrics] = dict()
+        self.functions : dict[str, FunctionMetrics] = dict()
+
+    def clear(self):
+        """
+        Forget every record, the function records are zeroed in place as
+        the timed functions keep hold of them
+        """
+        with self.lock:
+            self.equations = dict()
+
+            for record in self.functions.values():
+                record.calls = 0
+                record.top_calls = 0
+                record.total = 0.0
+                record.cache = None
+
+    def record_equation(self, key: int, equation_str: str, seconds: float):
+        """
+        Add an evaluation of an equation
+
+        ### Params:
+        key : int
+         The equation's key, None if it isn't in a worksheet yet
+        equation_str : str
+         The equation string
+        seconds : float
+         The time taken
+        """
+        with self.lock:
+            record_key = key if key is not None else equation_str
+            record = self.equations.get(record_key)
+
+            if (record is None):
+                record = self.equations[record_key] = EquationMetrics(key, equation_str)
+
+            record.equation_str = equation_str
+            record.calls += 1
+            record.total += seconds
+            record.last = seconds
+
+    def function(self, name: str) -> FunctionMetrics:
+        """
+        Get the record of a user function, creating it if needed
+
+        ### Params:
+        name : str
+         The function's name
+
+        ### Returns:
+        record : FunctionMetrics
+         The record the function adds its calls to
+        """
+        with self.lock:
+            record = self.functions.get(name)
+
+            if (record is None):
+                record = self.functions[name] = FunctionMetrics(name)
+
+            return record
+
+    def slowest_equations(self, count: int = None) -> list:
+        """
+        Get the equations that took longest the last time they ran
+
+        ### Params:
+        count = None
+         The number to return, all if None
+
+        ### Returns:
+        records : list
+         The EquationMetrics slowest first
+        """
+        with self.lock:
+            records = sorted(self.equations.values(), key=lambda record: record.last, reverse=True)
+
+        return records[:count]
+
+    def hottest_functions(self, count: int = None) -> list:
+        """
+        Get the user functions that took the most time in total
+
+        ### Params:
+        count = None
+         The number to return, all if None
+
+        ### Returns:
+        records : list
+         The FunctionMetrics with the most time first
+        """
+        with self.lock:
+            records = sorted((record for record in self.functions.values() if record.calls != 0 or record.hits != 0),
+                             key=lambda record: record.total, reverse=True)
+
+        return records[:count]
+
+    def save_json(self, path: str):
+        """
+        Save the records as JSON
+
+        ### Params:
+        path : str
+         The file to write
+        """
+        data = {"equations": [record.to_dict() for record in self.slowest_equations()],
+                "functions": [record.to_dict() for record in self.hottest_functions()]}
+
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def save_pstats(self, path: str):
+        """
+        Save the records in the format written by cProfile so they can be
+        read with pstats.Stats(path). Equations are listed as lines of a
+        file named <worksheet> and functions of one named <functions>.
+
+        ### Params:
+        path : str
+         The file to write
+        """
+        stats = dict()
+
+        # Each entry is (primitive calls, calls, own time, total time, callers)
+        for record in self.slowest_equations():
+            line = record.key if record.key is not None else 0
+            stats[("<worksheet>", line, record.equation_str)] = (record.calls, record.calls,
+                                                                 record.total, record.total, {})
+
+        for record in self.hottest_functions():
+            stats[("<functions>", 0, record.name)] = (record.top_calls, record.calls,
+                                                      record.total, record.total, {})
+
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+## The registry every measurement is added to
+REGISTRY = Registry()
+
+def enable(enabled: bool = True):
+    """
+    Start or stop recording, functions assigned while recording are timed
+
+    ### Params:
+    enabled = True
+     True to record
+    """
+    global ENABLED
+    ENABLED = enabled
+
+class TimedFunction():
+    """
+    Wraps a user function to count its calls and time them, only created
+    while metrics are enabled. A memoised function wraps this so only
+    the calls that miss its cache are timed.
+    """
+    def __init__(self, name: str, function: callable):
+        """
+        Create a timed function
+
+        ### Params:
+        name : str
+         The name the function is assigned to
+        function : callable
+         The function to time
+        """
+        self.__name__ = name
+        self.function = function
+        self.record = REGISTRY.function(name)
+        self.record.cache = None
+        self.depth = 0
+
+    def __call__(self, *args):
+        if (not ENABLED):
+            return self.function(*args)
+
+        self.record.calls += 1
+        if (self.depth != 0): # Recursive calls are timed by the outer call
+            return self.function(*args)
+
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        finally:
+            self.record.total += time.perf_counter() - start
+            self.record.top_calls += 1
+            self.depth -= 1
+
+    def __repr__(self):
+        return "<timed function " + self.__name__ + ">"
@@ -0,0 +1,180 @@
+## @file performance.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief A window listing the slowest equations and busiest user functions
+#  @details Recording is started from the window, the whole worksheet is
+#  recalculated so every equation is measured and user functions are
+#  made again with their timers. The tables refresh while it is open.
+
+import tkinter as tk
+from tkinter import ttk, filedialog
+
+import metrics
+from history import History
+from theme import Theme
+
+## The milliseconds between refreshes of the tables
+REFRESH_INTERVAL = 500
+
+## The number of rows shown in each table
+TABLE_ROWS = 50
+
+class PerformanceWindow(tk.Toplevel):
+    """
+    Shows the metrics recorded for a history
+    """
+    def __init__(self, history: History, theme_config: Theme) -> None:
+        """
+        Create a performance window
+
+        ### Params:
+        history : History
+         The history whose equations are measured
+        theme_config : Theme
+         The compiled theme
+
+        ### Variables:
+        recording : tk.BooleanVar
+         True while metrics are recorded
+
+        refresh_id : str
+         The after id of the next refresh
+        """
+        super().__init__()
+
+        self.history = history
+        self.theme = theme_config
+        self.recording = tk.BooleanVar(self, value=metrics.ENABLED)
+        self.refresh_id = None
+
+        self.create_window()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.refresh()
+
+    def create_window(self):
+        """
+        Create the performance window
+        """
+        self.rowconfigure(1, weight=2)
+        self.rowconfigure(2, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.columnconfigure(1, weight=1)
+        self.columnconfigure(2, weight=1)
+
+        self.title("Performance")
+        self.geometry("600x500")
+
+        self.chk_record = tk.Checkbutton(self, text="Record", variable=self.recording, command=self.__toggle_recording)
+        self.chk_record.grid(row=0, column=0, sticky="w")
+
+        self.btn_json = tk.Button(self, text="Save JSON", command=self.__save_json)
+        self.btn_json.grid(row=0, column=1, sticky="ew")
+
+        self.btn_pstats = tk.Button(self, text="Save pstats", command=self.__save_pstats)
+        self.btn_pstats.grid(row=0, column=2, sticky="ew")
+
+        self.tree_equations = self.__create_table(1, [("equation", "Equation", 300), ("last", "Last (ms)", 90),
+                                                      ("calls", "Runs", 60), ("total", "Total (ms)", 90)])
+
+        self.tree_functions = self.__create_table(2, [("function", "Function", 150), ("total", "Total (ms)", 90),
+                                                      ("calls", "Calls", 90), ("hits", "Cache hits", 90)])
+
+        self.apply_theme(self.theme)
+        self.theme.observers.append(self.apply_theme)
+
+    def apply_theme(self, theme: Theme):
+        """
+        Style the window's widgets, the tables use the shared styles.
+        Called again when the theme changes.
+
+        ### Params:
+        theme : Theme
+         The compiled theme
+        """
+        self.config(background=theme.colours.background)
+        self.chk_record.config(**theme.label_options, selectcolor=theme.colours.entry_background)
+
+        for button in [self.btn_json, self.btn_pstats]:
+            button.config(**theme.button_options)
+
+    def __create_table(self, row: int, columns: list) -> ttk.Treeview:
+        """
+        Create a table spanning the window
+
+        ### Params:
+        row : int
+         The grid row for the table
+        columns : list
+         The (name, heading, width) of each column
+
+        ### Returns:
+        table : ttk.Treeview
+         The table
+        """
+        names = [name for name, _, _ in columns]
+        table = ttk.Treeview(self, columns=names, show="headings", style="Metrics.Treeview")
+
+        for name, heading, width in columns:
+            table.heading(name, text=heading)
+            table.column(name, width=width, anchor="w" if name == names[0] else "e")
+
+        table.grid(row=row, column=0, columnspan=3, sticky="nsew")
+
+        return table
+
+    def __toggle_recording(self):
+        """
+        Start or stop recording, starting recalculates the worksheet so
+        every equation is measured
+        """
+        if (self.recording.get()):
+            metrics.REGISTRY.clear()
+            metrics.enable(True)
+            self.history.run(self.history.worksheet.recalculate)
+        else:
+            metrics.enable(False)
+
+    def refresh(self):
+        """
+        Show the latest records, called every REFRESH_INTERVAL ms
+        """
+        self.tree_equations.delete(*self.tree_equations.get_children())
+        for record in metrics.REGISTRY.slowest_equations(TABLE_ROWS):
+            self.tree_equations.insert("", "end", values=(record.equation_str, f"{record.last * 1e3:.3f}",
+                                                          record.calls, f"{record.total * 1e3:.3f}"))
+
+        self.tree_functions.delete(*self.tree_functions.get_children())
+        for record in metrics.REGISTRY.hottest_functions(TABLE_ROWS):
+            self.tree_functions.insert("", "end", values=(record.name, f"{record.total * 1e3:.3f}",
+                                                          record.calls, record.hits))
+
+        self.refresh_id = self.after(REFRESH_INTERVAL, self.refresh)
+
+    def __save_json(self):
+        """
+        Save the records as JSON
+        """
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if (path):
+            metrics.REGISTRY.save_json(path)
+
+    def __save_pstats(self):
+        """
+        Save the records for python -m pstats
+        """
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".prof",
+                                            filetypes=[("Profile", "*.prof")])
+        if (path):
+            metrics.REGISTRY.save_pstats(path)
+
+    def close(self):
+        """
+        Stop refreshing and close the window, recording carries on
+        """
+        if (self.refresh_id is not None):
+            self.after_cancel(self.refresh_id)
+
+        self.theme.observers.remove(self.apply_theme)
+        self.destroy()
@@ -0,0 +1,211 @@
+## @file row_index.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-16
+#  @brief An ordered list of rows with fast removal and positional lookup
+#  @details Rows are stored in append order with removed rows left as gaps.
+#  A Fenwick (binary indexed) tree counts the rows still present so the
+#  position of a row and the row at a position are found in log time.
+#
+#  Rows may also be given as their position in a lazy sequence, such as
+#  the lines of a session file. These are only made when read and aren't
+#  kept so a large file doesn't need an object for every row.
+
+class RowIndex():
+    """
+    An ordered sequence of unique rows supporting O(log n) append, remove,
+    index and positional access.
+    """
+    def __init__(self, rows = (), lazy = None):
+        """
+        Create a row index
+
+        ### Params:
+        rows = ()
+         The initial rows in order, an int is the position of a row in lazy
+        lazy = None
+         The sequence making the rows given by position
+
+        ### Variables:
+        lazy
+         The sequence making the rows given by position, this can be
+         swapped for another with the rows at the same positions
+        """
+        self.lazy = lazy
+        self.__build(list(rows))
+
+    def __build(self, rows: list):
+        """
+        Rebuild the index from a list of rows removing any gaps.
+
+        ### Params:
+        rows : list
+         The rows in order
+        """
+        self.__slots = rows
+        self.__positions = {row: slot for slot, row in enumerate(rows) if (not isinstance(row, int))}
+        self.__count = len(rows)
+
+        # The Fenwick tree is one based, tree[i] counts the rows in (i - lowbit(i), i]
+        self.__tree = [0] + [1] * len(rows)
+        for i in range(1, len(self.__tree)):
+            parent = i + (i & -i)
+            if (parent < len(self.__tree)):
+                self.__tree[parent] += self.__tree[i]
+
+    def __prefix(self, slot: int) -> int:
+        """
+        Count the rows present in the first slot slots
+
+        ### Params:
+        slot : int
+         The number of slots to count over
+
+        ### Returns:
+        count : int
+         The number of rows present
+        """
+        count = 0
+        while (slot > 0):
+            count += self.__tree[slot]
+            slot -= slot & -slot
+
+        return count
+
+    def __select(self, position: int) -> int:
+        """
+        Find the slot holding the row at a position
+
+        ### Params:
+        position : int
+         The zero based position
+
+        ### Returns:
+        slot : int
+         The zero based slot
+        """
+        slot = 0
+        step = 1 << (len(self.__tree) - 1).bit_length()
+        remaining = position + 1
+
+        while (step > 0):
+            if (slot + step < len(self.__tree) and self.__tree[slot + step] < remaining):
+                slot += step
+                remaining -= self.__tree[slot]
+            step >>= 1
+
+        return slot
+
+    def __len__(self):
+        return self.__count
+
+    def __contains__(self, row):
+        return row in self.__positions
+
+    def __iter__(self):
+        for row in self.__slots:
+            if (isinstance(row, int)):
+                yield self.lazy[row]
+            elif (row is not None):
+                yield row
+
+    def stored(self):
+        """
+        Iterate over the rows in order without making the lazy ones, these
+        are given as their position in lazy instead.
+        """
+        for row in self.__slots:
+            if (row is not None):
+                yield row
+
+    def __getitem__(self, position):
+        if (isinstance(position, slice)):
+            return [self[i] for i in range(*position.indices(self.__count))]
+
+        if (position < 0):
+            position += self.__count
+        if (position < 0 or position >= self.__count):
+            raise IndexError("row index out of range")
+
+        row = self.__slots[self.__select(position)]
+        if (isinstance(row, int)):
+            row = self.lazy[row]
+
+        return row
+
+    def __setitem__(self, position: int, row):
+        if (position < 0):
+            position += self.__count
+        if (position < 0 or position >= self.__count):
+            raise IndexError("row index out of range")
+
+        slot = self.__select(position)
+        self.__positions.pop(self.__slots[slot], None)
+        self.__slots[slot] = row
+        self.__positions[row] = slot
+
+    def append(self, row):
+        """
+        Add a row to the end
+
+        ### Params:
+        row
+         The row to add
+        """
+        self.__positions[row] = len(self.__slots)
+        self.__slots.append(row)
+        self.__count += 1
+
+        # The new node covers itself and the nodes below it within its lowbit
+        i = len(self.__tree)
+        self.__tree.append(1 + self.__prefix(i - 1) - self.__prefix(i - (i & -i)))
+
+    def remove(self, row):
+        """
+        Remove a row leaving a gap that is cleaned up once gaps outnumber rows
+
+        ### Params:
+        row
+         The row to remove, lazy rows must be replaced before they can be removed
+        """
+        slot = self.__positions.pop(row)
+        self.__slots[slot] = None
+        self.__count -= 1
+
+        i = slot + 1
+        while (i < len(self.__tree)):
+            self.__tree[i] -= 1
+            i += i & -i
+
+        if (len(self.__slots) > 2 * self.__count + 64):
+            self.__build(list(self.stored()))
+
+    def replace(self, row, new_row):
+        """
+        Put a new row in the place of an existing one
+
+        ### Params:
+        row
+         The row to replace
+        new_row
+         The row to put in its place
+        """
+        slot = self.__positions.pop(row)
+        self.__slots[slot] = new_row
+        self.__positions[new_row] = slot
+
+    def index(self, row) -> int:
+        """
+        Find the position of a row
+
+        ### Params:
+        row
+         The row to find
+
+        ### Returns:
+        position : int
+         The zero based position of the row
+        """
+        try:
+            return self.__prefix(self.__positions[row])
+        except KeyError:
+            raise ValueError("row is not in the index")
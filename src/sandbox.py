@@ -0,0 +1,188 @@
+## @file sandbox.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Evaluate equations in a separate process with cpu and memory limits
+#  @details The sandbox keeps one worker process running and sends it
+#  the same tasks as the recalculation pool (see scheduler.py) over a
+#  pipe, so the worker holds no state of its own. If an expression runs
+#  the worker out of cpu time or memory only the worker is lost, the
+#  equation shows an error and a new worker is started for the next one.
+#  The limits use the resource module so are only applied on unix, on
+#  other systems the worker is still separate from the GUI.
+#  This file has no GUI code.
+
+import math
+import multiprocessing
+import signal
+
+try:
+    import resource
+except ImportError: # Not available on windows
+    resource = None
+
+from expression_engine import INTERRUPTER, EvaluationCancelled
+from scheduler import evaluate_remote, WAIT_INTERVAL
+
+## The default cpu seconds each evaluation may use
+DEFAULT_CPU_LIMIT = 10
+
+## The default address space in bytes the worker may use
+DEFAULT_MEMORY_LIMIT = 1 << 31
+
+class SandboxCrashed(Exception):
+    """
+    Raised in place of the result when the worker stopped during an evaluation.
+    """
+    pass
+
+def serve(connection, cpu_limit: int, memory_limit: int):
+    """
+    Evaluate tasks received on a connection until it is closed, run in
+    the worker process.
+
+    ### Params:
+    connection : multiprocessing.connection.Connection
+     The worker's end of the pipe
+    cpu_limit : int
+     The cpu seconds each evaluation may use
+    memory_limit : int
+     The address space in bytes the worker may use
+    """
+    if (resource is not None):
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+        hard_cpu = resource.getrlimit(resource.RLIMIT_CPU)[1]
+
+    while (True):
+        try:
+            task = connection.recv()
+        except EOFError: # The GUI has closed the sandbox
+            return
+
+        if (resource is not None):
+            # The cpu limit counts the life of the process so it is moved on for each task
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            resource.setrlimit(resource.RLIMIT_CPU, (math.ceil(usage.ru_utime + usage.ru_stime) + cpu_limit, hard_cpu))
+
+        try:
+            outcome = evaluate_remote(task)
+            connection.send(outcome)
+        except Exception as error: # Results that can't be sent back
+            connection.send(("error", None, SandboxCrashed(str(error))))
+
+class Sandbox():
+    """
+    A worker process that evaluates equations with cpu and memory limits.
+    The worker is started when first needed and again after it stops.
+    """
+    def __init__(self, cpu_limit: int = DEFAULT_CPU_LIMIT, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        """
+        Create a sandbox
+
+        ### Params:
+        cpu_limit = DEFAULT_CPU_LIMIT
+         The cpu seconds each evaluation may use
+        memory_limit = DEFAULT_MEMORY_LIMIT
+         The address space in bytes the worker may use
+
+        ### Variables:
+        process : multiprocessing.Process
+         The worker process, None until started
+
+        connection : multiprocessing.connection.Connection
+         The GUI's end of the pipe to the worker
+
+        restarts : int
+         The number of times the worker has stopped and been replaced
+        """
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.process = None
+        self.connection = None
+        self.restarts = 0
+
+    def start(self):
+        """
+        Start the worker process, it is started by evaluate if needed.
+        """
+        # spawn rather than fork as the GUI process has other threads running
+        context = multiprocessing.get_context("spawn")
+        self.connection, worker_connection = context.Pipe()
+
+        self.process = context.Process(target=serve, name="sandbox", daemon=True,
+                                       args=(worker_connection, self.cpu_limit, self.memory_limit))
+        self.process.start()
+        worker_connection.close() # Only the worker's copy is kept open so its exit is seen
+
+    def evaluate(self, task: tuple) -> tuple:
+        """
+        Evaluate a task in the worker, this can be cancelled through the
+        engine's INTERRUPTER like an evaluation.
+
+        ### Params:
+        task : tuple
+         The task for scheduler.evaluate_remote
+
+        ### Returns:
+        (result, value, error)
+         The outcome of the task, the error is SandboxCrashed if the
+         worker stopped
+        """
+        if (self.process is None):
+            self.start()
+
+        try:
+            self.connection.send(task)
+            return INTERRUPTER.call(self.__receive)
+
+        except EvaluationCancelled:
+            self.close() # The worker may be part way through so is replaced
+            raise
+
+        except (EOFError, OSError):
+            reason = self.__exit_reason()
+            self.close()
+            self.restarts += 1
+
+            return ("error", None, SandboxCrashed(reason))
+
+    def __receive(self) -> tuple:
+        """
+        Wait for the worker to send the outcome of a task
+
+        ### Returns:
+        outcome : tuple
+         The outcome received
+        """
+        while (not self.connection.poll(WAIT_INTERVAL)):
+            pass
+
+        return self.connection.recv()
+
+    def __exit_reason(self) -> str:
+        """
+        Describe why the worker stopped
+
+        ### Returns:
+        reason : str
+         The reason for the error shown to the user
+        """
+        self.process.join(1)
+
+        if (self.process.exitcode == -getattr(signal, "SIGXCPU", 0)):
+            return "the evaluation used more than " + str(self.cpu_limit) + " s of cpu time"
+        elif (self.process.exitcode is not None and self.process.exitcode < 0):
+            return "the evaluation was stopped by signal " + str(-self.process.exitcode)
+
+        return "the evaluation stopped with exit code " + str(self.process.exitcode)
+
+    def close(self):
+        """
+        Stop the worker process, a new one is started when next needed
+        """
+        if (self.process is not None):
+            self.connection.close()
+            self.process.terminate()
+            self.process.join()
+
+            self.process = None
+            self.connection = None
@@ -0,0 +1,169 @@
+## @file scheduler.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Recalculate independent equations in parallel on a process pool
+#  @details The equations to recalculate are grouped into dependency
+#  levels, no equation reads a name assigned by another equation in its
+#  own level. Each level is run in turn and the equations in it that call
+#  user functions are sent to a pool of processes. User functions can't
+#  be sent between processes so each task carries the assignment strings
+#  of the functions it calls and the values of the variables it reads,
+#  the worker rebuilds them in a fresh namespace. Sending work costs
+#  about a millisecond a task and the first use starts the processes, so
+#  a level is only sent once its equations have been measured taking
+#  longer than PARALLEL_MIN_SECONDS in total.
+#  This file has no GUI code.
+
+import math
+import os
+
+from equation import Equation
+from equation_eval import default_assignments, Namespace
+from expression_engine import INTERRUPTER, EvaluationCancelled
+
+## Levels with fewer equations worth sending than this are evaluated in process
+PARALLEL_MIN_EQUATIONS = 2
+
+## Levels whose equations took less than this many seconds last time are evaluated in process
+PARALLEL_MIN_SECONDS = 0.05
+
+## The seconds between checks for a cancel while waiting on the pool
+WAIT_INTERVAL = 0.05
+
+def evaluate_remote(task: tuple) -> tuple:
+    """
+    Evaluate an equation in a worker process
+
+    ### Params:
+    task : tuple
+     (equation_str, context, max_array_bytes) where context is a list of
+     (name, assignment_str, value) in history order, assignment_str is
+     None if the value is sent instead
+
+    ### Returns:
+    (result, value, error)
+     The result of the equation, the value it assigns if it isn't a
+     function and the error raised (None if it succeeded)
+    """
+    equation_str, context, max_array_bytes = task
+
+    assignments = Namespace()
+    assignments.max_array_bytes = max_array_bytes
+    default_assignments(assignments)
+
+    for name, assignment_str, value in context:
+        if (assignment_str is None):
+            assignments[name] = value
+        else:
+            Equation(assignment_str, assignments)
+
+    equation = Equation(equation_str, assignments)
+    value = equation.value if not callable(equation.value) else None
+
+    return (equation.result, value, equation.error)
+
+def dependency_levels(equations: list, writers_of: callable) -> list:
+    """
+    Group equations so that none depends on another in the same group
+
+    ### Params:
+    equations : list
+     The equations in history order
+    writers_of : callable
+     Called with an equation to get the assignments it reads
+
+    ### Returns:
+    levels : list
+     The lists of equations in each level, in history order, a level
+     only depends on the levels before it
+    """
+    level_of = dict()
+    levels = list()
+
+    for equation in equations:
+        level = 0
+        for writer in writers_of(equation):
+            if (writer in level_of):
+                level = max(level, level_of[writer] + 1)
+
+        level_of[equation] = level
+        if (level == len(levels)):
+            levels.append(list())
+        levels[level].append(equation)
+
+    return levels
+
+class Scheduler():
+    """
+    Runs the evaluation of independent equations on a pool of processes.
+    The pool is only started the first time a level is worth sending to
+    it.
+    """
+    def __init__(self, processes: int = None):
+        """
+        Create a scheduler
+
+        ### Params:
+        processes = None
+         The number of worker processes, the number of cores if None
+
+        ### Variables:
+        pool : multiprocessing.Pool
+         The worker processes, None until first used
+        """
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.pool = None
+
+    @property
+    def parallel(self) -> bool:
+        """ True if there is more than one core to share the work between """
+        return self.processes > 1
+
+    def run(self, tasks: list) -> list:
+        """
+        Evaluate tasks on the pool, this can be cancelled through the
+        engine's INTERRUPTER like an evaluation.
+
+        ### Params:
+        tasks : list
+         The tasks for evaluate_remote
+
+        ### Returns:
+        outcomes : list
+         The (result, value, error) of each task in order
+        """
+        if (self.pool is None):
+            import multiprocessing # Only loaded once there is work for the pool
+
+            # spawn rather than fork as the GUI process has other threads running
+            self.pool = multiprocessing.get_context("spawn").Pool(self.processes)
+
+        chunksize = math.ceil(len(tasks) / (self.processes * 4))
+        pending = self.pool.map_async(evaluate_remote, tasks, chunksize)
+
+        try:
+            INTERRUPTER.call(self.__wait, pending)
+        except EvaluationCancelled:
+            self.close() # Stop the workers rather than wait for them to finish
+            raise
+
+        return pending.get()
+
+    def __wait(self, pending):
+        """
+        Wait for the pool to finish checking for a cancel
+
+        ### Params:
+        pending : multiprocessing.pool.AsyncResult
+         The tasks running on the pool
+        """
+        while (not pending.ready()):
+            pending.wait(WAIT_INTERVAL)
+
+    def close(self):
+        """
+        Stop the worker processes, the pool is started again when next needed
+        """
+        if (self.pool is not None):
+            self.pool.terminate()
+            self.pool = None
@@ -0,0 +1,407 @@
+## @file session.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-17
+#  @brief Saving and loading worksheets as a journal of changes
+#  @details A session file is a JSON line per change to the worksheet:
+#  {"op": "add", "key": 3, "equation": "1+1"}
+#  {"op": "edit", "key": 3, "equation": "1+2"}
+#  {"op": "del", "key": 3}
+#  {"op": "clear"}
+#  Each change is appended as it happens so saving never rewrites the
+#  file. Once the journal holds many more lines than the worksheet has
+#  equations it is compacted into one "add" line per equation.
+#
+#  Loading memory maps the file and only records where each equation is in
+#  arrays (about 25 bytes an equation), the equations are read and
+#  evaluated when the history first needs them.
+
+import bisect
+import json
+import mmap
+import os
+import re
+from array import array
+from itertools import compress
+
+from worksheet import Worksheet
+from equation import Equation
+
+## The file type used for sessions
+SESSION_EXTENSION = ".pcs"
+
+## The journal is compacted once it is this many times longer than the worksheet
+COMPACT_RATIO = 2
+
+## Journals shorter than this are never compacted
+COMPACT_MIN_LINES = 1024
+
+## A complete journal line, partly written lines don't match
+JOURNAL_LINE = re.compile(rb'\{"op": "(add|edit|del|clear)"(?:, "key": (\d+))?'
+                          rb'(?:, "equation": "([^"\\\r\n]*(?:\\.[^"\\\r\n]*)*)")?\}\r?\n')
+
+class LazyLine():
+    """
+    An equation in a session file that hasn't been read yet
+    """
+    __slots__ = ("source", "index", "key")
+
+    def __init__(self, source: "JournalSource", index: int):
+        """
+        Create a lazy line
+
+        ### Params:
+        source : JournalSource
+         The mapped session file
+        index : int
+         The position of the line in the source
+        """
+        self.source = source
+        self.index = index
+        self.key = source.keys[index]
+
+    @property
+    def assigns(self) -> bool:
+        """ False if the equation is certainly not an assignment """
+        return bool(self.source.assigns[self.index])
+
+    @property
+    def text(self) -> bytes:
+        """ The JSON escaped equation string as written in the file """
+        return self.source.data[self.source.starts[self.index]:self.source.ends[self.index]]
+
+    @property
+    def equation_str(self) -> str:
+        """ The equation string read from the file """
+        return json.loads(b'"' + self.text + b'"')
+
+class JournalSource():
+    """
+    A session file mapped into memory. Once scanned it is a sequence of
+    the equations still in the worksheet, the position of each is kept in
+    arrays and a LazyLine is only made when one is indexed.
+    """
+    def __init__(self, path: str):
+        """
+        Create a source for a session file, call open to map it.
+
+        ### Params:
+        path : str
+         The session file
+
+        ### Variables:
+        data : mmap
+         The contents of the file, empty until opened
+
+        lines : int
+         The number of complete journal lines found by scan
+
+        starts, ends : array
+         The position of each JSON escaped equation string in the file
+
+        keys : array
+         The key of each equation
+
+        assigns : bytearray
+         Zero for each equation that is certainly not an assignment
+        """
+        self.path = path
+        self.data = b""
+        self.lines = 0
+
+        self.starts = array("q")
+        self.ends = array("q")
+        self.keys = array("q")
+        self.assigns = bytearray()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index: int) -> LazyLine:
+        if (index < 0):
+            index += len(self.keys)
+        if (index < 0 or index >= len(self.keys)):
+            raise IndexError("journal index out of range")
+
+        return LazyLine(self, index)
+
+    def append(self, key: int, start: int, end: int, assigns: bool) -> int:
+        """
+        Add an equation to the end of the source
+
+        ### Params:
+        key : int
+         The key of the equation
+        start, end : int
+         The position of the JSON escaped equation string in the file
+        assigns : bool
+         False if the equation is certainly not an assignment
+
+        ### Returns:
+        index : int
+         The position of the equation in the source
+        """
+        self.starts.append(start)
+        self.ends.append(end)
+        self.keys.append(key)
+        self.assigns.append(assigns)
+
+        return len(self.keys) - 1
+
+    def open(self) -> "JournalSource":
+        """
+        Map the file into memory
+
+        ### Returns:
+        source : JournalSource
+         This source
+        """
+        with open(self.path, "rb") as f:
+            if (os.fstat(f.fileno()).st_size != 0):
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self
+
+    def close(self):
+        """
+        Unmap the file, it must not be read afterwards.
+        """
+        if (isinstance(self.data, mmap.mmap)):
+            self.data.close()
+        self.data = b""
+
+    def scan(self) -> "JournalSource":
+        """
+        Replay the journal to find the line of each equation still in the
+        worksheet without reading the equations themselves. Keys are
+        added in increasing order so they are found by bisection, a dict
+        is only built if a journal breaks that order.
+
+        ### Returns:
+        rows : JournalSource
+         This source holding the lazy rows in history order
+        """
+        starts = self.starts = array("q")
+        ends = self.ends = array("q")
+        keys = self.keys = array("q")
+        assigns = self.assigns = bytearray()
+        find = self.data.find
+        last = -1 # The largest key in order so far
+        indexes = None # The index of each key once keys are out of order
+        removed = 0
+        self.lines = 0
+
+        for match in JOURNAL_LINE.finditer(self.data):
+            self.lines += 1
+            op, key = match.group(1, 2)
+
+            if (op == b"clear"):
+                del starts[:], ends[:], keys[:], assigns[:]
+                last = -1
+                indexes = None
+                removed = 0
+                continue
+
+            key = int(key)
+            start, end = match.span(3)
+
+            if (key > last and indexes is None): # A new equation at the end
+                if (op != b"del"):
+                    starts.append(start)
+                    ends.append(end)
+                    keys.append(key)
+                    assigns.append(find(b":", start, end) != -1)
+                    last = key
+                continue
+
+            if (indexes is None):
+                index = bisect.bisect_left(keys, key)
+                if (index == len(keys) or keys[index] != key or starts[index] == -1):
+                    index = -1
+                    if (op != b"del"): # Such as a removed key added again at the end
+                        indexes = {keys[i]: i for i in range(len(keys)) if (starts[i] != -1)}
+            else:
+                index = indexes.get(key, -1)
+
+            if (op == b"del"):
+                if (index != -1):
+                    starts[index] = -1
+                    removed += 1
+                    if (indexes is not None):
+                        del indexes[key]
+            elif (index != -1): # An edit keeps its place
+                starts[index] = start
+                ends[index] = end
+                assigns[index] = find(b":", start, end) != -1
+            else:
+                indexes[key] = self.append(key, start, end, find(b":", start, end) != -1)
+
+        if (removed != 0):
+            kept = [start != -1 for start in starts]
+            self.starts = array("q", compress(starts, kept))
+            self.ends = array("q", compress(ends, kept))
+            self.keys = array("q", compress(keys, kept))
+            self.assigns = bytearray(compress(assigns, kept))
+
+        return self
+
+class Session():
+    """
+    Keeps a session file up to date with a worksheet by journaling each
+    change made to it.
+    """
+    def __init__(self, path: str, worksheet: Worksheet, source: JournalSource = None):
+        """
+        Start saving a worksheet to a session file. The file is written
+        with the current equations unless it was just loaded from source.
+
+        ### Params:
+        path : str
+         The session file to write
+        worksheet : Worksheet
+         The worksheet to save
+        source = None
+         The mapped session file the worksheet was loaded from
+
+        ### Variables:
+        lines : int
+         The number of lines in the journal
+        """
+        self.path = path
+        self.worksheet = worksheet
+        self.source = source
+        self.file = None
+        self.lines = 0
+
+        if (source is None):
+            self.compact()
+        else:
+            self.lines = source.lines
+            self.file = open(self.path, "ab")
+
+            if (len(source.data) != 0 and source.data[-1:] != b"\n"): # Finish a partly written line
+                self.file.write(b"\n")
+
+        self.worksheet.observers.append(self.record)
+
+    @staticmethod
+    def load(path: str, worksheet: Worksheet) -> "Session":
+        """
+        Load a session file into a worksheet and keep saving changes to
+        the file. The worksheet should be empty.
+
+        ### Params:
+        path : str
+         The session file to read
+        worksheet : Worksheet
+         The worksheet to add the equations to
+
+        ### Returns:
+        session : Session
+         The session saving to path
+        """
+        source = JournalSource(path).open()
+        worksheet.load(source.scan())
+
+        return Session(path, worksheet, source)
+
+    def record(self, action: str, equation: Equation):
+        """
+        Append a change to the journal, called by the worksheet.
+
+        ### Params:
+        action : str
+         The change made "add", "edit", "remove" or "clear"
+        equation : Equation
+         The equation changed, None when cleared
+        """
+        if (action == "add" or action == "edit"):
+            entry = {"op": action, "key": equation.key, "equation": equation.equation_str}
+        elif (action == "remove"):
+            entry = {"op": "del", "key": equation.key}
+        else:
+            entry = {"op": "clear"}
+
+        self.file.write(json.dumps(entry).encode() + b"\n")
+        self.file.flush()
+        self.lines += 1
+
+        if (self.lines > COMPACT_MIN_LINES and self.lines > COMPACT_RATIO * len(self.worksheet)):
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrite the journal with one line per equation. The new file
+        replaces the old one in a single step so a crash can't lose it.
+        Rows not yet read are copied across while the worksheet is locked
+        and keep their positions in a new source for the new file.
+        """
+        with self.worksheet.lock: # Rows mustn't be read while they are moved
+            if (self.file is not None):
+                self.file.close()
+
+            rows = self.worksheet.equations
+            source = JournalSource(self.path)
+            temp_path = self.path + ".tmp"
+            offset = 0
+
+            if (isinstance(rows.lazy, JournalSource)):
+                source.starts = array("q", rows.lazy.starts)
+                source.ends = array("q", rows.lazy.ends)
+                source.keys = array("q", rows.lazy.keys)
+                source.assigns = bytearray(rows.lazy.assigns)
+
+            with open(temp_path, "wb", buffering=1 << 16) as f:
+                for row in rows.stored():
+                    if (isinstance(row, int)):
+                        row = rows.lazy[row]
+
+                    prefix = b'{"op": "add", "key": %d, "equation": "' % row.key
+
+                    if (isinstance(row, Equation)):
+                        text = json.dumps(row.equation_str).encode()[1:-1]
+                    else:
+                        text = row.text
+
+                        if (row.source is not rows.lazy): # Loaded from another file alongside
+                            row.index = source.append(row.key, 0, 0, row.assigns)
+                            row.source = source
+
+                        source.starts[row.index] = offset + len(prefix)
+                        source.ends[row.index] = offset + len(prefix) + len(text)
+
+                    line = prefix + text + b'"}\n'
+                    f.write(line)
+                    offset += len(line)
+
+            # The old mapping has to be closed before the file can be replaced on windows
+            if (self.source is not None):
+                self.source.close()
+
+            os.replace(temp_path, self.path)
+
+            self.source = source.open()
+            self.lines = len(self.worksheet)
+            self.file = open(self.path, "ab")
+
+            if (rows.lazy is not None):
+                rows.lazy = source
+
+    def close(self):
+        """
+        Stop saving changes to the session file
+        """
+        if (self.record in self.worksheet.observers):
+            self.worksheet.observers.remove(self.record)
+
+        if (self.file is not None):
+            self.file.close()
+            self.file = None
+
+    def release(self):
+        """
+        Unmap the session file once no rows are read from it, such as
+        after the worksheet has been cleared or saved to another file
+        """
+        if (self.source is not None):
+            self.source.close()
+            self.source = None
@@ -0,0 +1,172 @@
+## @file theme.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-17
+#  @brief The theme compiled once into tk colours, fonts and styles
+#  @details The theme json is read into a ConfigDict of rgb colours. Rather
+#  than converting these for every widget the Theme resolves them once
+#  into tk colour strings, one shared named font and ttk styles which
+#  every row references. Changing the shared font updates every widget
+#  using it. A theme applied while the app is running restyles everything
+#  in one pass, the rows share the styles so the cost depends on the
+#  number of styles rather than the number of rows.
+
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+from configuration import FrozenConfigDict
+from utils import rgb_to_tk
+
+class Theme():
+    """
+    The resolved theme shared by every widget in the application.
+    """
+    ## The ttk label style used for each equation type
+    EQUATION_STYLES = {"comment": "Comment.TLabel",
+                       "assignment": "Assignment.TLabel",
+                       "equation": "Equation.TLabel"}
+
+    ## The colours every theme sets
+    COLOURS = ("equation", "comment", "assignment", "result", "background", "delete_button",
+               "entry_text", "entry_background", "other_button_background", "other_button_text")
+
+    def __init__(self, theme_config: FrozenConfigDict, root: tk.Misc = None):
+        """
+        Compile a theme, a tk root must exist first.
+
+        ### Params:
+        theme_config : FrozenConfigDict
+         The theme config loaded from the theme json
+        root = None
+         The tk root to create the font and styles for
+
+        ### Variables:
+        colours : FrozenConfigDict
+         The theme colours as tk colour strings
+
+        font : tkfont.Font
+         The named font shared by every widget
+
+        style : ttk.Style
+         The styles used by the history rows
+
+        entry_options : dict
+         The options for tk.Entry and tk.Text widgets
+
+        label_options : dict
+         The options for tk.Label widgets outside the history
+
+        button_options : dict
+         The options for tk.Button and tk.OptionMenu widgets
+
+        observers : list
+         Called with the theme after it changes, for the widgets that
+         aren't styled through ttk
+        """
+        self.config = None
+        self.font = tkfont.Font(root=root, family=theme_config.font.family, size=theme_config.font.size)
+        self.style = ttk.Style(root)
+        self.observers = list()
+
+        self.apply(theme_config)
+
+    def apply(self, theme_config: FrozenConfigDict):
+        """
+        Change to a new theme config, the shared styles and font are
+        changed in place then the observers restyle their own widgets.
+        The current font size is kept unless the config changes it.
+
+        ### Params:
+        theme_config : FrozenConfigDict
+         The theme config loaded from the theme json
+        """
+        # Resolved first so an invalid config leaves the current theme alone
+        colours = FrozenConfigDict((name, rgb_to_tk(theme_config.colours[name])) for name in self.COLOURS)
+        font = theme_config.font
+
+        if (self.config is not None and font != self.config.font):
+            self.font.configure(family=font.family, size=font.size)
+
+        self.config = theme_config
+        self.colours = colours
+
+        self.entry_options = {"background": self.colours.entry_background,
+                              "foreground": self.colours.entry_text,
+                              "relief": "flat",
+                              "insertbackground": "white",
+                              "highlightcolor": "white",
+                              "highlightthickness": 0,
+                              "insertwidth": 1,
+                              "font": self.font}
+
+        self.label_options = {"background": self.colours.background,
+                              "foreground": self.colours.comment,
+                              "font": self.font}
+
+        self.button_options = {"background": self.colours.other_button_background,
+                               "foreground": self.colours.other_button_text,
+                               "font": self.font}
+
+        self.__configure_styles()
+
+        for observer in self.observers:
+            observer(self)
+
+    def __configure_styles(self):
+        """
+        Create the ttk styles for the history rows and the performance
+        tables. Selected rows use the entry background through the
+        selected state.
+        """
+        selected = [("selected", self.colours.entry_background)]
+
+        self.style.configure("Row.TFrame", background=self.colours.background)
+        self.style.map("Row.TFrame", background=selected)
+
+        self.style.configure("Result.TLabel", foreground=self.colours.result,
+                             background=self.colours.background, font=self.font, anchor="w")
+        self.style.map("Result.TLabel", background=selected)
+
+        self.style.configure("Delete.TLabel", background=self.colours.delete_button, font=self.font)
+
+        for name, style in self.EQUATION_STYLES.items():
+            self.style.configure(style, foreground=self.colours[name],
+                                 background=self.colours.background, font=self.font, anchor="w")
+            self.style.map(style, background=selected)
+
+        # The tables in the performance window
+        self.style.configure("Metrics.Treeview", foreground=self.colours.equation, background=self.colours.background,
+                             fieldbackground=self.colours.background)
+        self.style.map("Metrics.Treeview", background=selected)
+        self.style.configure("Metrics.Treeview.Heading", foreground=self.colours.other_button_text,
+                             background=self.colours.other_button_background)
+
+    def equation_style(self, equation_type: str) -> str:
+        """
+        Get the ttk label style for an equation type
+
+        ### Params:
+        equation_type : str
+         The type of the equation "comment", "assignment" or "equation"
+
+        ### Returns:
+        style : str
+         The ttk style name
+        """
+        return self.EQUATION_STYLES.get(equation_type, "Equation.TLabel")
+
+    @property
+    def font_size(self) -> int:
+        """ The size of the shared font """
+        return self.font.cget("size")
+
+    def set_font_size(self, size: int):
+        """
+        Change the size of the shared font, every widget using the theme
+        is resized at once.
+
+        ### Params:
+        size : int
+         The new font size
+        """
+        self.font.configure(size=max(int(size), 1))
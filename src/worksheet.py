@@ -0,0 +1,771 @@
+## @file worksheet.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-14
+#  @brief The worksheet model holding the equations and their assignments
+#  @details This file has no GUI code so it can be used by the batch
+#  runner and tests without a display, see history.py for the GUI.
+#
+#  Rows loaded from a file may be left unevaluated until they are first
+#  needed. These lazy rows are any object with a key, an equation_str and
+#  an assigns flag which is True if the row could be an assignment. They
+#  are loaded as a sequence that makes each row when it is indexed so the
+#  worksheet only keeps their positions.
+
+import bisect
+import threading
+import time
+from itertools import compress
+
+from equation import Equation
+import metrics
+from equation_eval import compile_equation, default_assignments, split_assignment, Namespace
+from expression_engine import EvaluationCancelled
+from row_index import RowIndex
+from scheduler import dependency_levels, PARALLEL_MIN_EQUATIONS, PARALLEL_MIN_SECONDS
+
+
+class Worksheet():
+    """
+    The ordered list of equations along with the assignments they share
+    and the dependency graph between them.
+    """
+    def __init__(self):
+        """
+        The constructor for the Worksheet class
+
+        ### Variables:
+        assignments : Namespace
+         The functions and variables available to the equations
+
+        equations : RowIndex
+         The Equation objects (or lazy rows) in history order, supports
+         log time removal and positional lookup, use worksheet[i] to get
+         an evaluated Equation
+
+        readers : dict
+         The equations that read each name
+
+        writers : dict
+         The equations that assign each name ordered by key
+
+        observers : list
+         Functions called with (action, equation) after every change where
+         action is "add", "edit", "remove" or "clear" (with no equation)
+
+        lock : threading.RLock
+         Held while the worksheet or its assignments are changed so it can
+         be read from another thread
+
+        scheduler : Scheduler
+         Recalculates independent equations in parallel, None to
+         recalculate them one at a time
+
+        sandbox : Sandbox
+         Evaluates equations in a separate process with cpu and memory
+         limits, None to evaluate them in this process
+        """
+        # Create the assignments dictionary to store varaibles and functions
+        self.assignments = Namespace()
+        default_assignments(self.assignments)
+        self.__defaults = dict(self.assignments)
+
+        self.equations = RowIndex()
+
+        # The dependency graph between equations
+        self.readers : dict[str, set[Equation]] = dict()
+        self.writers : dict[str, list[Equation]] = dict()
+        self.__next_key = 0
+
+        self.observers = list()
+        self.lock = threading.RLock()
+        self.scheduler = None
+        self.sandbox = None
+
+    def __len__(self):
+        return len(self.equations)
+
+    def __getitem__(self, position: int) -> Equation:
+        with self.lock:
+            row = self.equations[position]
+            if (not isinstance(row, Equation)):
+                row = self.__materialise(position, row)
+
+            return row
+
+    def __iter__(self):
+        """
+        Iterate over the equations in history order. Lazy rows are
+        evaluated in turn but not kept so memory doesn't grow. The lock is
+        only held while a lazy row is evaluated so this can run on another
+        thread.
+        """
+        rows = self.equations
+        for row in rows.stored():
+            if (not isinstance(row, Equation)):
+                with self.lock: # Lazy rows are made here as compacting may move them to another source
+                    if (isinstance(row, int)):
+                        row = rows.lazy[row]
+                    row = self.__evaluate(row)
+
+            yield row
+
+    def load(self, rows):
+        """
+        Add rows read from a file to the end of the worksheet. Only rows
+        that could be assignments are evaluated now as later rows depend
+        on them, the rest are evaluated when first needed. The observers
+        are not told as the rows are already saved.
+
+        ### Params:
+        rows
+         A sequence of lazy rows in history order with increasing keys,
+         its assigns holds the assigns flag of each row
+        """
+        with self.lock:
+            # Rows still lazy from an earlier load are kept as objects
+            loaded = list(self.equations.lazy[row] if (isinstance(row, int)) else row
+                          for row in self.equations.stored())
+            offset = len(loaded)
+            loaded.extend(range(len(rows)))
+            assigned = set()
+
+            for index in compress(range(len(rows)), rows.assigns):
+                row = rows[index]
+                equation = Equation(row.equation_str, self.assignments, evaluate=False)
+                equation.key = row.key
+                self.__register(equation)
+                assigned.add(equation)
+                loaded[offset + index] = equation
+
+            if (len(rows) != 0):
+                self.__next_key = max(self.__next_key, rows[-1].key + 1)
+
+            # Build the index in one pass rather than appending each row
+            self.equations = RowIndex(loaded, rows)
+
+            self.__recompute(assigned, frozenset().union(*(equation.writes for equation in assigned)))
+
+    def __evaluate(self, row) -> Equation:
+        """
+        Evaluate a lazy row using the assignments in effect at its place
+        in the history.
+
+        ### Params:
+        row
+         The lazy row, never an assignment
+
+        ### Returns:
+        equation : Equation
+         The evaluated equation
+        """
+        equation_str = row.equation_str
+        reads = set()
+
+        if (not equation_str.startswith("#")):
+            try:
+                reads.update(compile_equation(equation_str).names)
+            except Exception: # Reported when evaluated
+                pass
+
+        # Functions read names when called so their names are bound too
+        queue = list(reads)
+        while (len(queue) != 0):
+            for name in self.assignments.dependencies.get(queue.pop(), ()):
+                if (name not in reads):
+                    reads.add(name)
+                    queue.append(name)
+
+        for name in reads:
+            self.__bind(name, self.__binding(name, row.key))
+
+        equation = Equation(equation_str, self.assignments, evaluate=False)
+        equation.key = row.key
+        self.__run(equation)
+
+        self.__bind_latest(reads)
+
+        return equation
+
+    def __materialise(self, position: int, row) -> Equation:
+        """
+        Evaluate a lazy row and keep the equation in its place
+
+        ### Params:
+        position : int
+         The position of the row
+        row
+         The lazy row
+
+        ### Returns:
+        equation : Equation
+         The evaluated equation
+        """
+        equation = self.__evaluate(row)
+
+        self.equations[position] = equation
+        self.__register(equation)
+
+        return equation
+
+    def add(self, equation_str: str) -> Equation:
+        """
+        Evaluate an equation string and add it to the end of the worksheet.
+
+        ### Params:
+        equation_str : str
+         The equation to add
+
+        ### Returns:
+        equation : Equation
+         The new equation
+        """
+        with self.lock:
+            return self.add_pending(Equation(equation_str, self.assignments, evaluate=False))
+
+    def add_pending(self, equation: Equation) -> Equation:
+        """
+        Evaluate an equation created without evaluating it and add it to
+        the end of the worksheet.
+
+        ### Params:
+        equation : Equation
+         The pending equation
+
+        ### Returns:
+        equation : Equation
+         The same equation now evaluated
+        """
+        with self.lock:
+            equation.assignments = self.assignments
+            equation.key = self.__next_key
+            self.__run(equation)
+            self.append(equation)
+
+            return equation
+
+    def extend(self, lines) -> list:
+        """
+        Evaluate several equation strings in order and add them to the
+        end of the worksheet.
+
+        ### Params:
+        lines
+         The equation strings to add, blank lines are skipped
+
+        ### Returns:
+        equations : list
+         The new equations
+        """
+        with self.lock:
+            return [self.add(line.strip()) for line in lines if len(line.strip()) != 0]
+
+    def append(self, equation: Equation):
+        """
+        Add an evaluated equation to the end of the worksheet.
+
+        ### Params:
+        equation : Equation
+         The equation to add
+        """
+        with self.lock:
+            equation.key = self.__next_key
+            self.__next_key += 1
+            self.__register(equation)
+
+            self.equations.append(equation)
+            self.__notify("add", equation)
+
+    def remove(self, equation: Equation) -> list:
+        """
+        Remove an equation. Equations that used a removed assignment are
+        recalculated.
+
+        ### Params:
+        equation : Equation
+         The equation to remove
+
+        ### Returns:
+        recalculated : list
+         The equations that were recalculated in history order
+        """
+        with self.lock:
+            affected = self.__downstream([equation])
+            self.__unregister(equation)
+
+            self.equations.remove(equation)
+            self.__notify("remove", equation)
+
+            return self.__recompute(affected, equation.writes)
+
+    def remove_many(self, equations) -> list:
+        """
+        Remove several equations in a single pass and recalculate the
+        remaining equations that used them once.
+
+        ### Params:
+        equations
+         The equations to remove
+
+        ### Returns:
+        recalculated : list
+         The equations that were recalculated in history order
+        """
+        with self.lock:
+            removed = set(equations)
+            if (len(removed) == 0):
+                return list()
+
+            affected = self.__downstream(removed).difference(removed)
+            names = set()
+
+            for equation in removed:
+                self.__unregister(equation)
+                names.update(equation.writes)
+
+            self.equations = RowIndex((row for row in self.equations.stored() if row not in removed),
+                                      self.equations.lazy)
+
+            for equation in removed:
+                self.__notify("remove", equation)
+
+            return self.__recompute(affected, names)
+
+    def clear(self):
+        """
+        Remove every equation and reset the assignments to the defaults.
+        """
+        with self.lock:
+            previous = self.assignments
+            self.assignments = Namespace()
+            self.assignments.memo_size = previous.memo_size
+            self.assignments.max_array_bytes = previous.max_array_bytes
+            default_assignments(self.assignments)
+
+            self.equations = RowIndex()
+            self.readers = dict()
+            self.writers = dict()
+
+            self.__notify("clear", None)
+
+    def update(self, equation: Equation, equation_str: str) -> list:
+        """
+        Change the text of an equation and recalculate it along with the
+        equations that depend on it.
+
+        ### Params:
+        equation : Equation
+         The equation to change
+        equation_str : str
+         The new equation string
+
+        ### Returns:
+        recalculated : list
+         The equations that were recalculated in history order
+        """
+        with self.lock:
+            affected = self.__downstream([equation])
+            old_writes = equation.writes
+
+            self.__unregister(equation)
+            equation.set_equation(equation_str)
+            self.__register(equation)
+            self.__notify("edit", equation)
+
+            affected.add(equation)
+            affected.update(self.__downstream([equation]))
+
+            return self.__recompute(affected, old_writes | equation.writes)
+
+    def __notify(self, action: str, equation: Equation):
+        """
+        Tell the observers about a change
+
+        ### Params:
+        action : str
+         The change made "add", "edit", "remove" or "clear"
+        equation : Equation
+         The equation changed, None when cleared
+        """
+        for observer in self.observers:
+            observer(action, equation)
+
+    def __register(self, equation: Equation):
+        """
+        Add an equation to the dependency graph
+
+        ### Params:
+        equation : Equation
+         The equation to add
+        """
+        for name in equation.reads:
+            self.readers.setdefault(name, set()).add(equation)
+
+        for name in equation.writes:
+            bisect.insort(self.writers.setdefault(name, list()), equation, key=lambda e: e.key)
+
+    def __unregister(self, equation: Equation):
+        """
+        Remove an equation from the dependency graph
+
+        ### Params:
+        equation : Equation
+         The equation to remove
+        """
+        for name in equation.reads:
+            self.readers[name].discard(equation)
+
+        for name in equation.writes:
+            self.writers[name].remove(equation)
+
+    def __binding(self, name: str, key: int) -> Equation:
+        """
+        Find the assignment of a name in effect at a point in the history
+
+        ### Params:
+        name : str
+         The name assigned
+        key : int
+         The key of the point in the history
+
+        ### Returns:
+        writer : Equation
+         The last equation before key assigning name, None if there isn't one
+        """
+        writers = self.writers.get(name)
+        if (not writers):
+            return None
+
+        index = bisect.bisect_left(writers, key, key=lambda e: e.key)
+        return writers[index-1] if index != 0 else None
+
+    def __downstream(self, equations: list) -> set:
+        """
+        Find the equations that use the assignments made by the given
+        equations directly or through other assignments.
+
+        ### Params:
+        equations : list
+         The equations that have changed
+
+        ### Returns:
+        affected : set
+         The equations that need to be recalculated
+        """
+        affected = set()
+        queue = list(equations)
+
+        while (len(queue) != 0):
+            writer = queue.pop()
+
+            for name in writer.writes:
+                for reader in self.__readers(name):
+                    if (reader not in affected and reader.key > writer.key
+                            and self.__writers(reader).get(name) is writer):
+                        affected.add(reader)
+                        queue.append(reader)
+
+        return affected
+
+    def __readers(self, name: str) -> set:
+        """
+        Find the equations that read a name directly or by calling a
+        function that reads it, functions read names when called so a
+        caller can come after an assignment the function comes before.
+
+        ### Params:
+        name : str
+         The name read
+
+        ### Returns:
+        readers : set
+         The equations that might read the name, check with __writers
+        """
+        readers = set()
+        names = {name}
+        queue = [name]
+
+        while (len(queue) != 0):
+            for reader in self.readers.get(queue.pop(), ()):
+                if (reader in readers):
+                    continue
+
+                readers.add(reader)
+
+                # Pending assignments could be functions
+                if (reader.pending or callable(reader.value)):
+                    for written in reader.writes.difference(names):
+                        names.add(written)
+                        queue.append(written)
+
+        return readers
+
+    def __bind(self, name: str, writer: Equation):
+        """
+        Set a name in the assignments to the value of the given assignment
+        or back to its default (or undefined) if there isn't one.
+
+        ### Params:
+        name : str
+         The name to set
+        writer : Equation
+         The assignment to take the value from, may be None
+        """
+        if (writer is not None):
+            if (self.assignments.get(name) is not writer.value):
+                self.assignments[name] = writer.value
+        elif (name in self.__defaults):
+            self.assignments[name] = self.__defaults[name]
+        elif (name in self.assignments):
+            del self.assignments[name]
+
+    def __bind_latest(self, names: set):
+        """
+        Set each name to the value of its latest assignment.
+
+        ### Params:
+        names : set
+         The names to set
+        """
+        for name in names:
+            writers = self.writers.get(name)
+            self.__bind(name, writers[-1] if writers else None)
+
+    def set_memory_limit(self, max_array_bytes: int) -> list:
+        """
+        Change the largest array an expression may create and recalculate
+        the worksheet so every equation is within it.
+
+        ### Params:
+        max_array_bytes : int
+         The largest array in bytes
+
+        ### Returns:
+        recalculated : list
+         The recalculated equations in history order
+        """
+        with self.lock:
+            self.assignments.max_array_bytes = max_array_bytes
+
+            return self.recalculate()
+
+    def recalculate(self) -> list:
+        """
+        Recalculate every evaluated equation, such as after the defaults
+        have changed. Rows not yet evaluated are left until needed.
+
+        ### Returns:
+        recalculated : list
+         The recalculated equations in history order
+        """
+        with self.lock:
+            equations = set(row for row in self.equations.stored() if isinstance(row, Equation))
+
+            return self.__recompute(equations, frozenset(self.writers))
+
+    def __writers(self, equation: Equation) -> dict:
+        """
+        Find the assignments in effect for the names an equation reads,
+        including the names read by the functions it calls.
+
+        ### Params:
+        equation : Equation
+         The equation
+
+        ### Returns:
+        writers : dict
+         The assignment of each name keyed by name, names with no
+         assignment before the equation are left out
+        """
+        writers = dict()
+        queue = list(equation.reads)
+
+        while (len(queue) != 0):
+            name = queue.pop()
+            if (name in writers):
+                continue
+
+            writer = self.__binding(name, equation.key)
+            if (writer is None):
+                continue
+
+            writers[name] = writer
+
+            # Functions read names when called, pending assignments could be functions
+            if (writer.pending or callable(writer.value)):
+                queue.extend(writer.reads)
+
+        return writers
+
+    def __is_function(self, equation: Equation) -> bool:
+        """
+        Check if an equation defines a function
+
+        ### Params:
+        equation : Equation
+         The equation
+
+        ### Returns:
+        out : bool
+         True if the equation assigns a function
+        """
+        try:
+            return equation.type == "assignment" and split_assignment(equation.equation_str)[1] is not None
+        except Exception:
+            return False
+
+    def __task(self, equation: Equation) -> tuple:
+        """
+        Describe an equation so it can be evaluated in another process
+
+        ### Params:
+        equation : Equation
+         The equation
+
+        ### Returns:
+        task : tuple
+         The task for scheduler.evaluate_remote, None for comments and
+         function assignments which run nothing when evaluated
+        """
+        if (equation.type == "comment" or self.__is_function(equation)):
+            return None
+
+        writers = sorted(self.__writers(equation).items(), key=lambda item: item[1].key)
+
+        # Functions are sent as their assignment, variables as their value
+        context = [(name, writer.equation_str, None) if callable(writer.value) else (name, None, writer.value)
+                   for name, writer in writers]
+
+        return (equation.equation_str, context, self.assignments.max_array_bytes)
+
+    def __run(self, equation: Equation):
+        """
+        Evaluate an equation in the sandbox if there is one, otherwise in
+        this process. The names it reads must already be bound.
+
+        ### Params:
+        equation : Equation
+         The equation with its key set
+        """
+        task = self.__task(equation) if self.sandbox is not None else None
+        start = time.perf_counter()
+
+        if (task is None):
+            equation.evaluate()
+            equation.seconds = time.perf_counter() - start
+            return
+
+        try:
+            outcome = self.sandbox.evaluate(task)
+        except EvaluationCancelled as error:
+            outcome = ("error", None, error)
+
+        equation.seconds = time.perf_counter() - start
+
+        if (metrics.ENABLED):
+            metrics.REGISTRY.record_equation(equation.key, equation.equation_str, equation.seconds)
+
+        if (equation.type == "assignment" and outcome[1] is None and outcome[2] is None):
+            equation.evaluate() # Variables holding functions can't be sent back so are assigned here
+        else:
+            equation.finish(*outcome)
+
+    def __evaluate_level(self, level: list):
+        """
+        Recalculate a level of equations that don't depend on each other,
+        on the scheduler's pool if enough of them are worth sending.
+
+        ### Params:
+        level : list
+         The equations in history order
+
+        ### Returns:
+        names : set
+         The names set to their value at an equation in the level
+        """
+        names = set()
+        remote = list()
+        tasks = list()
+        outcomes = list()
+
+        # Work done in the pool's processes isn't measured so it all runs here while recording
+        if (self.scheduler is not None and not metrics.ENABLED and len(level) >= PARALLEL_MIN_EQUATIONS):
+            for equation in level:
+                task = self.__task(equation)
+
+                # Only equations calling user functions are worth the cost of sending
+                if (task is not None and any(assignment_str is not None for _, assignment_str, _ in task[1])):
+                    remote.append(equation)
+                    tasks.append(task)
+
+        # Equations not measured yet are run here first so their cost is known next time
+        cost = sum(equation.seconds or 0 for equation in remote)
+
+        if (len(tasks) >= PARALLEL_MIN_EQUATIONS and cost >= PARALLEL_MIN_SECONDS):
+            try:
+                outcomes = self.scheduler.run(tasks)
+            except EvaluationCancelled as error:
+                outcomes = [("error", None, error)] * len(tasks)
+            except Exception: # Values that can't be sent are evaluated here
+                pass
+
+        if (len(outcomes) == 0):
+            remote = list()
+
+        sent = set(remote)
+        for equation in level:
+            if (equation not in sent):
+                # Make sure the names read (also by the functions called) have the value in effect at this point
+                writers = self.__writers(equation)
+                reads = set(equation.reads).union(writers)
+                for writer in writers.values():
+                    if (writer.pending or callable(writer.value)):
+                        reads.update(writer.reads)
+
+                for name in reads:
+                    self.__bind(name, writers.get(name))
+
+                names.update(reads)
+                self.__run(equation)
+
+        for equation, (result, value, error) in zip(remote, outcomes):
+            equation.finish(result, value, error)
+
+        return names
+
+    def __recompute(self, affected: set, names: frozenset) -> list:
+        """
+        Recalculate the affected equations in history order, or level by
+        level when there is a scheduler.
+
+        ### Params:
+        affected : set
+         The equations to recalculate
+        names : frozenset
+         The names whose assignments changed
+
+        ### Returns:
+        recalculated : list
+         The recalculated equations in history order
+        """
+        names = set(names)
+        self.__bind_latest(names)
+
+        recalculated = sorted(affected, key=lambda e: e.key)
+        for equation in recalculated:
+            names.update(equation.writes)
+
+        cost = sum(equation.seconds or 0 for equation in recalculated)
+
+        if (self.scheduler is not None and self.scheduler.parallel and not metrics.ENABLED
+                and len(recalculated) >= PARALLEL_MIN_EQUATIONS and cost >= PARALLEL_MIN_SECONDS):
+            levels = dependency_levels(recalculated, lambda equation: self.__writers(equation).values())
+        else:
+            levels = [[equation] for equation in recalculated]
+
+        for level in levels:
+            names.update(self.__evaluate_level(level))
+
+        # Leave every name with its latest assignment
+        self.__bind_latest(names)
+
+        return recalculated
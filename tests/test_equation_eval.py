@@ -0,0 +1,47 @@
+## @file test_equation_eval.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Tests for memoised user functions
+#
+#  Run with:
+#  python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+## The folder holding the application sources
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+if (SRC_DIR not in sys.path):
+    sys.path.insert(0, SRC_DIR)
+
+from worksheet import Worksheet
+
+class TestMemoisedFunction(unittest.TestCase):
+    """
+    Memoised functions only answer from the cache for the same arguments
+    """
+    def test_argument_types_kept_apart(self):
+        worksheet = Worksheet()
+        worksheet.add("h(x):=x")
+        worksheet.add("f(x):=h(x)")
+
+        for equation_str in ["f(1)", "f(1.0)", "f(True)"]:
+            worksheet.add(equation_str)
+
+        self.assertEqual(worksheet.assignments.cache_stats()["f"]["misses"], 3)
+
+    def test_integer_result_type(self):
+        worksheet = Worksheet()
+        worksheet.add("h(x):=x")
+        worksheet.add("f(x):=h(x)")
+
+        first = worksheet.add("f(1.0)").result
+        second = worksheet.add("f(1)").result
+
+        self.assertIs(type(first), float)
+        self.assertIs(type(second), int)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+## @file test_expression_engine.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Tests for the expression engine whitelist and guards
+#
+#  Run with:
+#  python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+## The folder holding the application sources
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+if (SRC_DIR not in sys.path):
+    sys.path.insert(0, SRC_DIR)
+
+from expression_engine import compile_expression, compile_function, evaluate, ExpressionError
+from equation_eval import default_assignments, eval_equation, Namespace
+
+class TestWhitelist(unittest.TestCase):
+    """
+    Syntax outside the whitelist is rejected before it is compiled
+    """
+    def assertRejected(self, source: str):
+        with self.assertRaises(ExpressionError):
+            compile_expression(source)
+
+    def test_attribute_access(self):
+        self.assertRejected("().__class__")
+        self.assertRejected("sin.__self__")
+        self.assertRejected("(1).real")
+
+    def test_dunder_names(self):
+        self.assertRejected("__import__('os')")
+        self.assertRejected("__builtins__")
+        self.assertRejected("__pow_guard__(2, 3)")
+
+    def test_keyword_and_star_calls(self):
+        self.assertRejected("max(x=1)")
+        self.assertRejected("max(*x)")
+        self.assertRejected("max(**x)")
+        self.assertRejected("f(1)(2)")
+
+    def test_strings(self):
+        self.assertRejected("'abc'")
+        self.assertRejected("b'abc'")
+        self.assertRejected("len('abc')")
+
+    def test_other_syntax(self):
+        for source in ["[1, 2]", "(1, 2)", "{1: 2}", "x[0]", "lambda: 1", "(y := 1)", "[x for x in y]"]:
+            with self.subTest(source=source):
+                self.assertRejected(source)
+
+    def test_function_parameters(self):
+        with self.assertRaises(ExpressionError):
+            compile_function("f", ["__class__"], "1")
+        with self.assertRaises(ExpressionError):
+            compile_function("f", ["x", "x"], "x")
+
+    def test_allowed(self):
+        namespace = {"x": 3}
+
+        self.assertEqual(evaluate(compile_expression("x*2+1 if x > 2 and not x == 4 else 0"), namespace), 7)
+        self.assertEqual(compile_expression("min(x, y) + 1").names, frozenset({"min", "x", "y"}))
+
+class TestGuards(unittest.TestCase):
+    """
+    Integer operators that would take too long to compute raise an
+    OverflowError instead
+    """
+    def setUp(self):
+        self.assignments = Namespace()
+        default_assignments(self.assignments)
+
+    def test_power(self):
+        with self.assertRaises(OverflowError):
+            evaluate(compile_expression("9**9**9"), {})
+        with self.assertRaises(OverflowError):
+            eval_equation("9^9^9", self.assignments)
+
+    def test_shift(self):
+        with self.assertRaises(OverflowError):
+            evaluate(compile_expression("1<<(1<<30)"), {})
+
+    def test_power_in_function(self):
+        function = evaluate(compile_function("f", ["x"], "x**x**x"), {})
+
+        self.assertEqual(function(2), 16)
+        with self.assertRaises(OverflowError):
+            function(9)
+
+    def test_small_results(self):
+        self.assertEqual(evaluate(compile_expression("2**10 + (1<<10)"), {}), 2048)
+        self.assertEqual(eval_equation("2.0^0.5", self.assignments), 2.0 ** 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
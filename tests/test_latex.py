@@ -0,0 +1,44 @@
+## @file test_latex.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Tests for typesetting equations as LaTeX
+#
+#  Run with:
+#  python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+## The folder holding the application sources
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+if (SRC_DIR not in sys.path):
+    sys.path.insert(0, SRC_DIR)
+
+from latex import equation_to_latex
+from worksheet import Worksheet
+
+class TestEquationToLatex(unittest.TestCase):
+    """
+    Equations that can't be converted are written as text rather than
+    stopping the export
+    """
+    def test_long_sum(self):
+        equation_str = "+".join(["x"] * 500)
+
+        self.assertEqual(equation_to_latex(equation_str), r"\text{" + equation_str + "}")
+
+    def test_long_sum_in_worksheet(self):
+        worksheet = Worksheet()
+        worksheet.add("x:=1")
+        equation = worksheet.add("+".join(["x"] * 500))
+
+        self.assertEqual(equation.result, 500)
+        self.assertTrue(equation.latex().startswith(r"\text{x+x"))
+
+    def test_short_sum(self):
+        self.assertEqual(equation_to_latex("x+1"), "x + 1")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+## @file test_session.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Tests for loading and compacting session journals
+#
+#  Run with:
+#  python3 -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+## The folder holding the application sources
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+if (SRC_DIR not in sys.path):
+    sys.path.insert(0, SRC_DIR)
+
+from session import JournalSource, Session
+from worksheet import Worksheet
+
+class TestJournal(unittest.TestCase):
+    """
+    A journal scanned and compacted keeps the same equations
+    """
+    ## The journal written by the tests with an edit, a removal and a partly written line
+    JOURNAL = (b'{"op": "add", "key": 0, "equation": "a:=2"}\n'
+               b'{"op": "add", "key": 1, "equation": "a+1"}\n'
+               b'{"op": "add", "key": 2, "equation": "# \\"note\\""}\n'
+               b'{"op": "add", "key": 3, "equation": "a*10"}\n'
+               b'{"op": "edit", "key": 1, "equation": "a+5"}\n'
+               b'{"op": "del", "key": 3}\n'
+               b'{"op": "add", "key": 4, "equation": "a*')
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".pcs")
+        with os.fdopen(handle, "wb") as f:
+            f.write(self.JOURNAL)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_scan(self):
+        source = JournalSource(self.path).open()
+        rows = source.scan()
+
+        self.assertEqual(source.lines, 6)
+        self.assertEqual([row.key for row in rows], [0, 1, 2])
+        self.assertEqual([row.equation_str for row in rows], ["a:=2", "a+5", '# "note"'])
+        self.assertEqual([row.assigns for row in rows], [True, False, False])
+        source.close()
+
+    def test_scan_key_added_again(self):
+        with open(self.path, "ab") as f:
+            f.write(b'\n{"op": "del", "key": 0}\n{"op": "add", "key": 0, "equation": "a:=4"}\n')
+
+        source = JournalSource(self.path).open()
+
+        self.assertEqual([(row.key, row.equation_str) for row in source.scan()],
+                         [(1, "a+5"), (2, '# "note"'), (0, "a:=4")])
+        source.close()
+
+    def test_compact_round_trip(self):
+        worksheet = Worksheet()
+        session = Session.load(self.path, worksheet)
+        session.compact()
+
+        # The rows not yet read now point into the compacted file
+        self.assertEqual([worksheet[i].equation_str for i in range(len(worksheet))],
+                         ["a:=2", "a+5", '# "note"'])
+        self.assertEqual(worksheet[1].result, 7)
+
+        worksheet.add("a-1")
+        session.close()
+        session.release()
+
+        reloaded = Worksheet()
+        session = Session.load(self.path, reloaded)
+
+        self.assertEqual(session.lines, 4)
+        self.assertEqual([equation.equation_str for equation in reloaded],
+                         ["a:=2", "a+5", '# "note"', "a-1"])
+        self.assertEqual(reloaded[3].result, 1)
+        session.close()
+        session.release()
+
+if __name__ == "__main__":
+    unittest.main()
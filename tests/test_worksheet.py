@@ -0,0 +1,73 @@
+## @file test_worksheet.py
+#  @author Jack Duignan (JackpDuignan@gmail.com)
+#  @date 2024-10-18
+#  @brief Tests for recalculating the worksheet when assignments change
+#
+#  Run with:
+#  python3 -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+## The folder holding the application sources
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+if (SRC_DIR not in sys.path):
+    sys.path.insert(0, SRC_DIR)
+
+from worksheet import Worksheet
+
+class TestRecalculation(unittest.TestCase):
+    """
+    Editing or removing an assignment recalculates every equation using it
+    """
+    def create(self, equation_strs: list) -> tuple:
+        worksheet = Worksheet()
+        rows = [worksheet.add(equation_str) for equation_str in equation_strs]
+
+        return worksheet, rows
+
+    def test_direct_reader(self):
+        worksheet, rows = self.create(["y:=1", "y+1", "y:=5", "y+1"])
+
+        worksheet.update(rows[0], "y:=2")
+
+        self.assertEqual([row.result for row in rows], [2, 3, 5, 6])
+
+    def test_reader_through_function(self):
+        worksheet, rows = self.create(["g(x):=x+y", "y:=1", "g(1)", "y:=5", "g(1)"])
+
+        recalculated = worksheet.update(rows[1], "y:=2")
+
+        self.assertEqual([row.result for row in rows], [None, 2, 3, 5, 6])
+        self.assertEqual(recalculated, [rows[1], rows[2]])
+
+    def test_reader_through_nested_function(self):
+        worksheet, rows = self.create(["h(x):=x*y", "g(x):=h(x)+1", "y:=2", "g(3)"])
+
+        worksheet.update(rows[2], "y:=4")
+
+        self.assertEqual(rows[3].result, 13)
+
+    def test_remove_through_function(self):
+        worksheet, rows = self.create(["g(x):=x+y", "y:=1", "g(1)", "y:=5", "g(1)"])
+
+        worksheet.remove(rows[1])
+
+        self.assertEqual(rows[2].result, "error")
+        self.assertIsInstance(rows[2].error, NameError)
+        self.assertEqual(rows[4].result, 6)
+        self.assertEqual(worksheet.assignments["y"], 5)
+
+    def test_latest_assignment_kept(self):
+        worksheet, rows = self.create(["z:=1", "a:=1", "a+z", "z:=2"])
+
+        worksheet.update(rows[1], "a:=3")
+
+        self.assertEqual(rows[2].result, 4)
+        self.assertEqual(worksheet.assignments["z"], 2)
+        self.assertEqual(worksheet.add("z").result, 2)
+
+if __name__ == "__main__":
+    unittest.main()